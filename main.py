@@ -1,44 +1,71 @@
-from utils.bucket_conn import logs_conn, logs_conn_monthly
+import os
+from utils.bucket_conn import TweetLedger, logs_conn_monthly
+from utils.orchestrator import run_concurrently, get_budgets
 from src.run_fgv import run_fgv_scheduler
 from src.run_ibge import run_ibge
 from src.run_bcb import run_bcb
 from src.run_ppi import run_ppi
 from src.run_anfavea import run_anfa
 from src.run_ssp import run_ssp
-from google.cloud import logging as gcp_logging
+from utils.log_conn import get_logger, flush_all
+from src.release_index import load_index, DUE_WINDOW_HOURS
+
+# Set up Google Cloud Logging, entries are batched and written in the background
+logger = get_logger('main_run')
+
+
+def _format_result(result):
+    if isinstance(result, tuple):
+        return " ".join(result) if all(isinstance(item, str) for item in result) else str(result)
+    return result
 
-# Set up Google Cloud Logging
-client = gcp_logging.Client()
-logger = client.logger('main_run') 
 
 def main_run(request):
+    try:
+        return _run_sources()
+    finally:
+        # The instance may be throttled once the response is sent, write pending logs first
+        flush_all()
+
+
+def _run_sources():
     logger.log_text(f"Starting main_run function execution", severity="INFO")
-    log_posts_df = logs_conn()
+
+    # Idle invocations stop here, before the logs or any source are touched
+    try:
+        due = load_index(logger).due_sources(DUE_WINDOW_HOURS)
+    except Exception as e:
+        logger.log_text(f"Release index unavailable, running every source: {str(e)}", severity="WARNING")
+        due = None
+    if due is not None and not due:
+        logger.log_text(f"No releases due in the next {DUE_WINDOW_HOURS:g} hours", severity="INFO")
+        return f"No releases due in the next {DUE_WINDOW_HOURS:g} hours\n"
+
+    ledger = TweetLedger()
     month_log_posts_df = logs_conn_monthly()
-    result_fgv = run_fgv_scheduler(logger, log_posts_df)
-    result_ibge = run_ibge(logger, log_posts_df)
-    result_bcb = run_bcb(log_posts_df, logger)
-    result_abicom = run_ppi(logger, log_posts_df)
-    result_anfa = run_anfa(logger, log_posts_df)
-    # result_ssp = run_ssp(logger, log_posts_df, month_log_posts_df)
-
-    if isinstance(result_fgv, tuple):
-        result_fgv = " ".join(result_fgv) if all(isinstance(item, str) for item in result_fgv) else str(result_fgv)
-    
-    if isinstance(result_ibge, tuple):
-        result_ibge = " ".join(result_ibge) if all(isinstance(item, str) for item in result_ibge) else str(result_ibge)
-
-    if isinstance(result_bcb, tuple):
-        result_bcb = " ".join(result_bcb) if all(isinstance(item, str) for item in result_bcb) else str(result_bcb)
-    
-    if isinstance(result_abicom, tuple):
-        result_abicom = " ".join(result_abicom) if all(isinstance(item, str) for item in result_abicom) else str(result_abicom)
-
-    if isinstance(result_anfa, tuple):
-        result_anfa = " ".join(result_anfa) if all(isinstance(item, str) for item in result_anfa) else str(result_anfa)
-
-    # if isinstance(result_ssp, tuple):
-    #     result_ssp = " ".join(result_ssp) if all(isinstance(item, str) for item in result_ssp) else str(result_ssp)
-    
-
-    return result_fgv + "\n" + result_ibge + "\n" + result_bcb + "\n" + result_abicom + "\n" + result_anfa + "\n" #+ result_ssp
\ No newline at end of file
+
+    sources = {
+        "fgv": lambda: run_fgv_scheduler(logger, ledger),
+        "ibge": lambda: run_ibge(logger, ledger),
+        "bcb": lambda: run_bcb(ledger, logger),
+        "abicom": lambda: run_ppi(logger, ledger),
+        "anfavea": lambda: run_anfa(logger, ledger),
+        # "ssp": lambda: run_ssp(logger, ledger, month_log_posts_df),
+    }
+    if due is not None:
+        logger.log_text(f"Sources with releases due: {', '.join(sorted(due))}", severity="INFO")
+        sources = {name: task for name, task in sources.items() if name in due}
+
+    # RUN_MODE=sequential restores the one-after-another execution
+    if os.environ.get("RUN_MODE", "concurrent") == "sequential":
+        results = {name: task() for name, task in sources.items()}
+    else:
+        results = run_concurrently(sources, get_budgets(list(sources)), logger=logger)
+
+    # Posts were appended as separate ledger entries, fold them into the daily CSV
+    try:
+        ledger.compact()
+    except Exception as e:
+        logger.log_text(f"Failed to compact tweeted logs: {str(e)}", severity="WARNING")
+
+    return "".join(_format_result(result) + "\n" for result in results.values())
@@ -1,18 +1,34 @@
+import argparse
 import httpx
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
 import pandas as pd
 from bs4 import BeautifulSoup
 from typing import List, Dict
 import re
+from utils.http_conn import get_client
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type, RetryError
 
+# Daily pages fetched at once, the shared HTTP client also caps requests to abicom.com.br
+PPI_WORKERS = 4
+
 class PpiCrawler:
-    def __init__(self, start_date: datetime.date):
+    def __init__(self, start_date: datetime.date, stored_dates=None, end_date: datetime.date = None, workers: int = PPI_WORKERS):
+        """
+        :param start_date: First day of the window.
+        :param stored_dates: Dates already stored (e.g. in BigQuery), their pages are not fetched again.
+        :param end_date: Last day of the window, defaults to today.
+        :param workers: Maximum number of pages fetched concurrently.
+        """
         self.name = "ppi_crawler"
         self.allowed_domains = ["abicom.com.br"]
         self.base_url = "https://abicom.com.br"
         self.today = datetime.today().date()
         self.start_date = start_date
+        self.end_date = end_date or self.today
+        self.stored_dates = {pd.Timestamp(day).date() for day in (stored_dates if stored_dates is not None else [])}
+        self.workers = workers
 
     @retry(stop=stop_after_attempt(5), wait=wait_fixed(5), retry=retry_if_exception_type(httpx.HTTPError))
     def _safe_request(self, client: httpx.Client, url: str):
@@ -87,24 +103,71 @@ class PpiCrawler:
         # Unnest content keys and combine with date
         return {**{'date': date_norm}, **processed_content}
 
-    def run(self):
-        with httpx.Client() as client:
-            if self.check_date(client):
-                print("Latest date matches today's date, continuing the script.")
+    def missing_dates(self) -> List[date]:
+        """Business days of the window whose PPI is not stored yet."""
+        date_range = pd.date_range(start=self.start_date, end=self.end_date, freq='B')
+        return [day.date() for day in date_range if day.date() not in self.stored_dates]
+
+    def _fetch(self, client: httpx.Client, day: date):
+        try:
+            return self.fetch_content(client, day.strftime('%d-%m-%Y'))
+        except Exception as e:
+            print(f"Error processing data for date {day:%d-%m-%Y}: {e}")
+            return None
+
+    def fetch_many(self, client: httpx.Client, dates: List[date]) -> List[Dict[str, float]]:
+        """Fetches the pages of several dates concurrently, results in date order."""
+        if not dates:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(dates))) as executor:
+            results = list(executor.map(lambda day: self._fetch(client, day), dates))
+        return [result for result in results if result is not None]
+
+    def run(self, check: bool = True):
+        """
+        Fetches the PPI of the business days of the window that are not stored yet.
+
+        :param check: Stop unless the PPI listing already shows today's page (daily runs). Backfills
+                      of past windows pass False.
+        :return: List of daily records, or None when today's page is not published yet.
+        """
+        client = get_client()
+        if check and not self.check_date(client):
+            print("Latest date does not match today's date, stopping the crawler.")
+            return None  # Return an empty list if the crawl was stopped
+
+        dates = self.missing_dates()
+        print(f"Fetching {len(dates)} PPI pages, {len(self.stored_dates)} dates already stored.")
+        return self.fetch_many(client, dates)
+
+
+def complete_records(data: List[Dict[str, float]]) -> List[Dict[str, float]]:
+    """Records with every value, the ones of holidays and failed fetches (no page) are not stored."""
+    return [row for row in data if None not in row.values()]
+
+
+def backfill(start_date: date, end_date: date = None, project_id: str = None, dataset_id: str = None, table_id: str = None):
+    """
+    Fills the gaps of the PPI table over a long window, fetching only the missing business days.
 
-                date_range_raw = pd.date_range(start=self.start_date, end=self.today, freq='B')
-                date_range = [date.strftime('%d-%m-%Y') for date in date_range_raw]
+    :return: Number of dates written to the table.
+    """
+    from utils.bq_conn import get_data_from_bq_table, upsert_bq_table
 
-                results = []
-                for date in date_range:
-                    try:
-                        result = self.fetch_content(client, date)
-                        results.append(result)
-                    except Exception as e:
-                        print(f"Error processing data for date {date}: {e}")
+    project_id = project_id or os.environ.get('PROJECT_ID')
+    dataset_id = dataset_id or os.environ.get('DATASET_ID')
+    table_id = table_id or os.environ.get('TABLE_ID')
+    df_raw = get_data_from_bq_table(project_id=project_id, dataset_id=dataset_id, table_id=table_id, start_date=start_date, end_date=end_date)
+    stored = [] if df_raw.empty else df_raw.index
+    data = PpiCrawler(start_date, stored_dates=stored, end_date=end_date).run(check=False)
+    rows = complete_records(data)
+    upsert_bq_table(project_id, dataset_id, table_id, rows)
+    return len(rows)
 
-                return results  # Return collected results
 
-            else:
-                print("Latest date does not match today's date, stopping the crawler.")
-                return None  # Return an empty list if the crawl was stopped
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill of the ABICOM PPI table.")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last day (YYYY-MM-DD), defaults to today")
+    args = parser.parse_args()
+    print(f"Stored {backfill(args.start, args.end)} dates")
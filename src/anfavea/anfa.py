@@ -1,11 +1,16 @@
-import httpx
+from utils.http_conn import get, head
+from email.utils import parsedate_to_datetime
+from datetime import timedelta
 from bs4 import BeautifulSoup
 import pandas as pd
 import io
 
+# Workbooks uploaded a few days before the release still count, the previous edition is a month older
+LAST_MODIFIED_TOLERANCE = timedelta(days=5)
+
 def get_xls_link():
     url = 'https://anfavea.com.br/site/edicoes-em-excel/'
-    response = httpx.get(url)
+    response = get(url)
     soup = BeautifulSoup(response.text, 'html.parser')
     series_hist_elem = soup.find('div', class_='et_pb_tab_content')
     link_elem = series_hist_elem.find_all('a')
@@ -18,8 +23,22 @@ def get_xls_link():
 
     return target_url
 
+def workbook_updated_since(url, since) -> bool:
+    """
+    Cheap freshness check: a HEAD request on the workbook, compared with the release date.
+
+    :return: False when Last-Modified shows the workbook predates since, True otherwise
+             (including when the server sends no Last-Modified, so the full download still runs).
+    """
+    try:
+        last_modified = head(url).headers.get('Last-Modified')
+        return last_modified is None or parsedate_to_datetime(last_modified).date() >= since - LAST_MODIFIED_TOLERANCE
+    except Exception as e:
+        print(f"Workbook HEAD check failed, downloading anyway: {e}")
+        return True
+
 def read_excel(url):
-    response = httpx.get(url)
+    response = get(url)
     with io.BytesIO(response.content) as file:
         df = pd.read_excel(
             file, 
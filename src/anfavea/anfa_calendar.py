@@ -1,7 +1,8 @@
-import httpx
+from utils.http_conn import get
 from bs4 import BeautifulSoup
 import re
 import pandas as pd
+from utils.calendar_cache import get_calendar
 
 
 # Function to filter valid dates
@@ -20,10 +21,18 @@ def find_dates(elements):
 def check_release_date():
     url = 'https://anfavea.com.br/site/'
 
-    response = httpx.get(url)
+    response = get(url)
     soup = BeautifulSoup(response.text, 'html.parser')
     h4_list = soup.find_all('h4')
     release_date_raw = find_dates(h4_list)
     release_date = pd.to_datetime(release_date_raw[0], format='%d/%m/%Y').date()
 
     return release_date
+
+def load_calendar(logger=None) -> pd.DataFrame:
+    """Returns the next ANFAVEA release date as a one-row calendar, cached like the other calendars."""
+    def build():
+        release_date = pd.Timestamp(check_release_date())
+        return pd.DataFrame({'divulgacao': [release_date], 'title': ['anfavea']}).set_index('divulgacao')
+
+    return get_calendar('anfavea', build, logger=logger)
@@ -1,28 +1,21 @@
 from datetime import datetime
-from bcb.sgs import get as sgs_get
 import pandas as pd
-import requests
+from src.bcb.sgs import get_many, default_start, probe
 
 
-def get_bc_serie(series: list, name: str, colunas: list, reference: datetime.date, raw: bool = False, multiplicador: int = 1):
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "application/json, text/plain, */*"
-    })
-    original_get = requests.get
-    requests.get = session.get
-    
-    dict_codes = dict(zip(colunas, series))
+def get_bc_serie(series: list, name: str, colunas: list, reference: datetime.date, raw: bool = False, multiplicador: int = 1, start=None):
+    # Only the window used by the charts and texts is requested, see src.bcb.sgs.WINDOW_MONTHS
+    start = start if start is not None else default_start(reference)
     try:
-        df_merged = sgs_get(codes=dict_codes)
-        df_merged.rename_axis('data', axis='index', inplace=True)
+        # The full fetch only runs once the last observation shows the new reference period
+        if not probe(dict(zip(colunas, series)), reference):
+            print('Dados não atualizados na fonte')
+            return None
+        df_merged = get_many(dict(zip(colunas, series)), start=start, stored=True)
     except Exception as e:
         print(f"Error for series: {e}")
         return None
-    finally:
-        requests.get = original_get
-        
+
     df_merged = df_merged * multiplicador
     df_merged.name = name
     
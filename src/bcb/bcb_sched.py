@@ -1,26 +1,33 @@
 import pandas as pd
 from pandas.tseries.offsets import BDay
 from datetime import datetime, timedelta
-import requests
 from bs4 import BeautifulSoup
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils.log_conn import get_logger
+from utils.http_conn import get
+from utils.calendar_cache import get_calendar
 
+AGENDA_URL = "https://www.bcb.gov.br/api/servico/sitebcb/agendas"
+AGENDA_WORKERS = 8
+AGENDA_TIMEOUT = 10.0  # seconds per agenda list
+AGENDA_DEADLINE = 20.0  # seconds for the whole set of lists
 
-def bcb_calendar(arg, logger = None):
+
+def _fetch_agenda(item, inicio, fim):
+    url = f"{AGENDA_URL}?lista={item}&inicioAgenda='{inicio}'&fimAgenda='{fim}'"
+    response = get(url, timeout=AGENDA_TIMEOUT)
+    response.raise_for_status()
+    data = response.json().get('conteudo')
+    return pd.DataFrame(data) if data else None
+
+
+def build_calendar(arg, logger):
     """
-    Fetches events data from the Banco Central do Brasil (BCB) website for a predefined list of items.
-    Extracts relevant event information from the HTML content, creates a DataFrame, and returns it.
-    Returns:
-        pd.DataFrame: A DataFrame containing the extracted event data with columns:
-                      'evento', 'dataEvento', 'fimEvento', and 'descricao'.
-                      'evento': The event type or name.
-                      'dataEvento': The start date and time of the event.
-                      'fimEvento': The end date and time of the event (if available).
-                      'descricao': The description of the event.
-    Note:
-        This function fetches event data for the current date until December 31st of the current year.
-        The 'descricao' column contains HTML content, and the function extracts text from it.
+    Fetches the agenda lists concurrently over the shared connection pool and parses them into
+    the full calendar (every date). Lists that fail or do not answer within AGENDA_DEADLINE are
+    logged and skipped, and the result is then flagged as partial so it is not cached.
     """
     lista = [
         'Boletim Regional', 'Eventos no Banco Central', 'Estatísticas do Valores a Receber', 'Focus', 
@@ -36,18 +43,30 @@ def bcb_calendar(arg, logger = None):
         'mes': f'{today.year}-{today.month}-01'
     }
     dataframes = []
-    # Fetch data for each item in the predefined list
-    for item in lista:
-        url = f"https://www.bcb.gov.br/api/servico/sitebcb/agendas?lista={item}&inicioAgenda='{dict_arg[arg]}'&fimAgenda='{today.year}-12-31'"
-        response = requests.get(url)
-        if response.ok:
-            data = response.json().get('conteudo')
-            if data:
-                dataframes.append(pd.DataFrame(data))
+    # Fetch data for each item in the predefined list, with bounded parallelism
+    executor = ThreadPoolExecutor(max_workers=AGENDA_WORKERS, thread_name_prefix='bcb-agenda')
+    futures = {executor.submit(_fetch_agenda, item, dict_arg[arg], f'{today.year}-12-31'): item for item in lista}
+    done, not_done = wait(futures, timeout=AGENDA_DEADLINE)
+    executor.shutdown(wait=False, cancel_futures=True)
+    for future in not_done:
+        logger.log_text(f"BCB agenda list timed out: {futures[future]}", severity="WARNING")
+    for future in done:
+        try:
+            data = future.result()
+            if data is not None:
+                dataframes.append(data)
+        except Exception as e:
+            logger.log_text(f"Failed to fetch BCB agenda list {futures[future]}: {str(e)}", severity="WARNING")
+    if not dataframes:
+        logger.log_text("No BCB agenda list could be fetched", severity="ERROR")
+        return None
+    partial = len(dataframes) < len(lista)
     # Concatenate all DataFrames into a single DataFrame
     df = pd.concat(dataframes)
     # Convert 'dataEvento' column to datetime and set it as the DataFrame index
     df['dataEvento'] = pd.to_datetime(df['dataEvento'])
+    # Keep the release time before the index is reduced to the day (midnight means no time given)
+    df['hora'] = df['dataEvento'].dt.strftime('%H:%M').replace('00:00', None)
     df.set_index('dataEvento', drop=True, inplace=True)
     # Convert the datetime index to a string in '%Y-%m-%d' format
     df.index = df.index.strftime('%Y-%m-%d')
@@ -88,13 +107,46 @@ def bcb_calendar(arg, logger = None):
                 'fimEvento': cambial_fim_evento,
                 'descricao': descricao,
                 'local': cambial_local,
-                'diaInteiro': cambial_dia_inteiro
+                'diaInteiro': cambial_dia_inteiro,
+                'hora': None
             })
         cambial_df = pd.DataFrame(cambial_rows)
         cambial_df.set_index('dataEvento', inplace=True)
         df = pd.concat([df, cambial_df])
         df.sort_index(inplace=True)
 
+    df.attrs['partial'] = partial
+    return df
+
+
+def load_calendar(arg, logger):
+    """Returns the full BCB calendar, from the calendar cache when possible."""
+    return get_calendar(f'bcb-{arg}', lambda: build_calendar(arg, logger), logger=logger)
+
+
+def bcb_calendar(arg, logger = None):
+    """
+    Fetches events data from the Banco Central do Brasil (BCB) website for a predefined list of items.
+    Extracts relevant event information from the HTML content, creates a DataFrame, and returns it.
+    Returns:
+        pd.DataFrame: A DataFrame containing the extracted event data with columns:
+                      'evento', 'dataEvento', 'fimEvento', and 'descricao'.
+                      'evento': The event type or name.
+                      'dataEvento': The start date and time of the event.
+                      'fimEvento': The end date and time of the event (if available).
+                      'descricao': The description of the event.
+    Note:
+        This function fetches event data for the current date until December 31st of the current year.
+        The 'descricao' column contains HTML content, and the function extracts text from it.
+        The full calendar is cached for the month (see utils.calendar_cache), so most runs read
+        one small file instead of querying the 21 agenda lists.
+    """
+    logger = logger or get_logger('bcb_calendar')
+    today = datetime.today()
+    df = load_calendar(arg, logger)
+    if df is None:
+        return None
+
     try:
         df = df.loc[f'{today.date()}']
         if isinstance(df, pd.DataFrame):
@@ -0,0 +1,95 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from utils.http_conn import get
+from utils.ts_store import append_delta, delta_start
+
+SGS_URL = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{code}/dados"
+SGS_LAST_URL = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{code}/dados/ultimos/{last}"
+SGS_WORKERS = 8
+# History requested when no start date is given, enough for the 5-year charts plus 12-month variations
+WINDOW_MONTHS = int(os.environ.get('SGS_WINDOW_MONTHS', 72))
+# Stored observations this recent are requested again, since the BCB revises recent values
+REVISION_WINDOW = pd.DateOffset(months=int(os.environ.get('SGS_REVISION_MONTHS', 3)))
+
+
+def default_start(reference: date = None) -> date:
+    """First day of the default window before the reference date (today when None)."""
+    reference = pd.Timestamp(reference or date.today()).date()
+    return (reference - relativedelta(months=WINDOW_MONTHS)).replace(day=1)
+
+
+def get_series(code: int, name: str = None, start: date = None, end: date = None, last: int = None) -> pd.Series:
+    """
+    Fetches an SGS series from the Banco Central open data API over the shared HTTP client.
+
+    :param code: SGS series code.
+    :param name: Name given to the returned Series (defaults to the code).
+    :param start: First date of the window (dataInicial).
+    :param end: Last date of the window (dataFinal), defaults to today when start is given.
+    :param last: Fetch only the last N observations (ultimos/N) instead of a date window.
+    :return: pandas Series indexed by date with the numeric values (empty when the window has no data).
+    """
+    if last is not None:
+        url, params = SGS_LAST_URL.format(code=code, last=last), {"formato": "json"}
+    else:
+        url, params = SGS_URL.format(code=code), {"formato": "json"}
+        if start is not None:
+            params["dataInicial"] = pd.Timestamp(start).strftime('%d/%m/%Y')
+            params["dataFinal"] = pd.Timestamp(end or date.today()).strftime('%d/%m/%Y')
+
+    response = get(url, params=params)
+    # SGS answers 404 when the window has no observations
+    if response.status_code == 404:
+        return pd.Series(dtype=float, index=pd.DatetimeIndex([], name='data'), name=name or code)
+    response.raise_for_status()
+    df = pd.DataFrame(response.json(), columns=['data', 'valor'])
+    return pd.Series(
+        pd.to_numeric(df['valor'], errors='coerce').values,
+        index=pd.to_datetime(df['data'], format='%d/%m/%Y'),
+        name=name or code
+    )
+
+
+def get_stored(code: int, name: str = None, start: date = None) -> pd.Series:
+    """
+    Returns an SGS series from start on, asking the API only for what the time-series store lacks.
+
+    Observations newer than the last stored one (minus REVISION_WINDOW) are fetched and upserted
+    into the store as 'sgs/<code>'.
+    """
+    series = f"sgs/{code}"
+    start = pd.Timestamp(start or default_start())
+    new = get_series(code, 'valor', start=delta_start(series, start, REVISION_WINDOW))
+    stored = append_delta(series, new.to_frame())
+    return stored['valor'].loc[start:].rename(name or code)
+
+
+def get_many(codes: dict, start: date = None, end: date = None, last: int = None, stored: bool = False) -> pd.DataFrame:
+    """
+    Fetches several SGS series concurrently and aligns them on their dates.
+
+    Safe to call from parallel workers: requests go through the shared, thread-safe HTTP client.
+
+    :param codes: Mapping of column name to SGS code.
+    :param stored: Read through the time-series store (see get_stored), only start is used then.
+    :return: pandas DataFrame with one column per series, indexed by date ('data').
+    """
+    with ThreadPoolExecutor(max_workers=min(SGS_WORKERS, len(codes))) as executor:
+        if stored:
+            futures = [executor.submit(get_stored, code, name, start) for name, code in codes.items()]
+        else:
+            futures = [executor.submit(get_series, code, name, start, end, last) for name, code in codes.items()]
+        series = [future.result() for future in futures]
+    return pd.concat(series, axis=1).rename_axis('data', axis='index')
+
+
+def probe(codes: dict, reference: date) -> bool:
+    """
+    Cheap freshness check: fetches only the last observation of each series (ultimos/1) and
+    tells whether the newest one is already the reference period.
+    """
+    latest = get_many(codes, last=1).index.max()
+    return not pd.isna(latest) and latest.date() == pd.Timestamp(reference).date()
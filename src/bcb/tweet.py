@@ -242,7 +242,7 @@ def text_m2(df, name):
     return tweet
 
 
-def create_tweet(text, image_path, image_buffer):
+def create_tweet(text, image_path, image_buffer, sla=None):
     # Retrieve environment variables
     consumer_key = os.environ.get("CONSUMER_KEY")
     consumer_secret = os.environ.get("CONSUMER_SECRET")
@@ -265,7 +265,11 @@ def create_tweet(text, image_path, image_buffer):
 
     # Upload image to Twitter. Replace 'filename' your image filename.
     media_id = api.media_upload(filename=f"{image_path}", file=image_buffer).media_id_string
+    if sla:
+        sla.mark("media_uploaded")
     
     # Send Tweet with Text and media ID
     client.create_tweet(text=text, media_ids=[media_id])
+    if sla:
+        sla.mark("tweeted")
     print("Tweeted!")
\ No newline at end of file
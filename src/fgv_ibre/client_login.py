@@ -1,8 +1,21 @@
 import httpx
+import json
+import os
+import threading
 import time
 import re
+from datetime import datetime, timedelta
 from urllib.parse import unquote
-from google.cloud import logging as gcp_logging
+from utils.log_conn import get_logger
+from utils.http_conn import new_session
+from utils.storage_conn import get_storage
+
+# Authenticated portal sessions are reused across indicators and invocations until they expire
+SESSION_KEY = 'fgv-session/session.json'
+SESSION_TTL = timedelta(hours=float(os.environ.get('FGV_SESSION_TTL_HOURS', 8)))
+
+_session = None
+_session_lock = threading.Lock()
 
 class FGVPortalClient:
     BASE_URL = "https://autenticacao-ibre.fgv.br/ProdutosDigitais"
@@ -12,13 +25,13 @@ class FGVPortalClient:
         "OutSystems-client-env": "browser"
     }
 
-    def __init__(self, max_retries: int = 2, gcp_logging_client: gcp_logging.Client = None):
-        self.client = httpx.Client(follow_redirects=True, timeout=10.0)
+    def __init__(self, max_retries: int = 2, gcp_logging_client=None):
+        self.client = new_session()
         self.csrf_token: str | None = None
         self.module_version: str | None = None
         self.current_url: str | None = None
         self.max_retries = max_retries
-        self.gcp_logger = gcp_logging_client or gcp_logging.Client()
+        self.gcp_logger = gcp_logging_client or get_logger('fgv_portal_client')
 
     def login(self, username: str, password: str) -> httpx.Client | bool:
         """Handle the complete login flow to FGV Portal with retry mechanism"""
@@ -209,6 +222,27 @@ class FGVPortalClient:
             return token
         return None
 
+    def to_dict(self) -> dict:
+        """Cookies and CSRF token of the session, as stored by save_session"""
+        cookies = [
+            {"name": cookie.name, "value": cookie.value, "domain": cookie.domain, "path": cookie.path}
+            for cookie in self.client.cookies.jar
+        ]
+        return {
+            "cookies": cookies,
+            "csrf_token": self.csrf_token,
+            "expires_at": (datetime.now() + SESSION_TTL).isoformat(),
+        }
+
+    def restore(self, data: dict) -> bool:
+        """Loads a stored session, returns False when it expired"""
+        if datetime.fromisoformat(data["expires_at"]) <= datetime.now():
+            return False
+        for cookie in data["cookies"]:
+            self.client.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+        self.csrf_token = data.get("csrf_token")
+        return True
+
     def get_current_url(self) -> str | None:
         """Retorna a URL atual"""
         return self.current_url
@@ -217,3 +251,52 @@ class FGVPortalClient:
         """Fecha a sessão do cliente"""
         if self.client:
             self.client.close()
+
+
+def _keep(portal: FGVPortalClient, expires_at: str) -> httpx.Client:
+    global _session
+    _session = (portal, expires_at)
+    return portal.client
+
+
+def get_session(username: str, password: str, logger=None, refresh: bool = False) -> httpx.Client | bool:
+    """
+    Returns an authenticated FGV portal session, logging in only when needed.
+
+    The session is kept in memory for warm instances and its cookies and CSRF token are stored as
+    fgv-session/session.json in the 'tt-bot' bucket (or under STORAGE_DIR) until SESSION_TTL
+    passes, so later invocations skip the login flow.
+
+    :param refresh: Discard the current session (e.g. after the portal rejected it) and log in again.
+    :return: The authenticated httpx.Client, or False when the login failed.
+    """
+    global _session
+    logger = logger or get_logger('fgv_portal_client')
+    with _session_lock:
+        if refresh:
+            _session = None
+        if _session is not None and datetime.fromisoformat(_session[1]) > datetime.now():
+            return _session[0].client
+
+        portal = FGVPortalClient(gcp_logging_client=logger)
+        storage = None
+        try:
+            storage = get_storage()
+            raw = None if refresh else storage.read_bytes(SESSION_KEY)
+            data = json.loads(raw) if raw else None
+            if data and portal.restore(data):
+                logger.log_text("Reusing stored FGV portal session", severity="INFO")
+                return _keep(portal, data["expires_at"])
+        except Exception as e:
+            logger.log_text(f"Failed to read stored FGV session: {str(e)}", severity="WARNING")
+
+        client = portal.login(username, password)
+        if not client:
+            return False
+        data = portal.to_dict()
+        if storage is not None:
+            try:
+                storage.write_bytes(SESSION_KEY, json.dumps(data).encode('utf-8'), content_type='application/json')
+            except Exception as e:
+                logger.log_text(f"Failed to store FGV session: {str(e)}", severity="WARNING")
+        return _keep(portal, data["expires_at"])
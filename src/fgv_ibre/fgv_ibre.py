@@ -1,14 +1,64 @@
-from .client_login import FGVPortalClient
+from .client_login import FGVPortalClient, SESSION_TTL
+import hashlib
 import httpx
+import json
+import re
+from datetime import datetime
 import pandas as pd
-from bs4 import BeautifulSoup
-from google.cloud import logging as gcp_logging
-import io
+from .html_extract import hidden_fields, element_attribute, radio_values, results_table
+from utils.log_conn import get_logger
+from utils.storage_conn import get_storage
+from utils.ts_store import append_delta, last_observation
+
+# Stored months this recent are requested again, since the FGV revises recent values
+REVISION_WINDOW = pd.DateOffset(months=3)
+RESULT_OPTIONS = "ctl00$cphConsulta$gnResultado"
+# The gnResultado option selecting the period given by txtPeriodoInicio/txtPeriodoFim is read from the form
+PERIOD_OPTION = re.compile(r'per[ií]odo', re.IGNORECASE)
+# Form state reached after selecting a set of series (step 2), replayed to skip the first posts
+VIEWSTATE_PREFIX = 'fgv-session/viewstate'
+# Grid header caption of each series code, learned from single-indicator queries
+CAPTIONS_KEY = 'fgv-session/captions.json'
+
+_viewstates = {}
+_captions = None
+
+
+def window_start(codes):
+    """
+    First date to ask the portal for, so a query only returns what the time-series store lacks.
+
+    :param codes: FGV series codes of the query.
+    :return: First day of the month of the earliest last stored observation minus REVISION_WINDOW,
+             or None (full history) when any of the series was never stored.
+    """
+    lasts = [last_observation(f"fgv/{code}") for code in codes]
+    if not lasts or any(last is None for last in lasts):
+        return None
+    return (min(lasts) - REVISION_WINDOW).replace(day=1).date()
+
+def _load_captions() -> dict:
+    global _captions
+    if _captions is None:
+        try:
+            raw = get_storage().read_bytes(CAPTIONS_KEY)
+            _captions = json.loads(raw) if raw else {}
+        except Exception as e:
+            print(f"An error occurred while reading the FGV grid captions: {e}")
+            return {}
+    return _captions
 
 class FGVSpider:
-    def __init__(self, client=None, serie=None, columns=None, logger=None, ref_date=None):
+    def __init__(self, client=None, serie=None, columns=None, logger=None, ref_date=None, start_date=None, match_header=False):
         """
         Modificação do construtor para aceitar o client já autenticado como parâmetro.
+
+        Com match_header, as colunas do resultado são identificadas pelo cabeçalho da tabela em vez
+        da posição; se o cabeçalho não corresponder às séries pedidas, header_mismatch fica True e
+        nenhum resultado é devolvido.
+
+        Com start_date, a consulta pede ao portal apenas o período de start_date até hoje e o
+        resultado é completado com o histórico guardado no time-series store.
         """
         self.client = client  # Agora recebemos o client já autenticado
         self.base_url = "https://extra-ibre.fgv.br/IBRE/sitefgvdados/default.aspx"
@@ -16,13 +66,15 @@ class FGVSpider:
         self.result_df = pd.DataFrame()
         self.columns = columns
         self.ref_date = ref_date
-        if logger is None:
-            # Set up Google Cloud Logger
-            client = gcp_logging.Client()
-            self.logger = client.logger('fgv_spider')
-        else:
-            self.logger = logger
-        self.logger.log_text(f"Spider initialized with serie: {self.serie} and columns: {self.columns}", severity="INFO")
+        self.start_date = start_date
+        self.session_rejected = False
+        self._state = None
+        self.period_option = None
+        self.grid_empty = False
+        self.match_header = match_header
+        self.header_mismatch = False
+        self.logger = logger or get_logger('fgv_spider')
+        self.logger.log_text(f"Spider initialized with serie: {self.serie} and columns: {self.columns}, start date: {self.start_date or 'full history'}", severity="INFO")
 
     def _get_initial_page(self):
         try:
@@ -30,6 +82,11 @@ class FGVSpider:
             # Aqui estamos fazendo o "refresh" da página utilizando a URL já logada
             response = self.client.get(self.base_url)  # Usando a base_url que foi configurada
             self.logger.log_text(f"Initial page response status code: {response.status_code}", severity="DEBUG")
+            # An expired session lands on the login page instead of the query form
+            self.session_rejected = "__VIEWSTATE" not in response.text
+            if self.session_rejected:
+                self.logger.log_text("Portal session rejected", severity="WARNING")
+                return None
             return response
         except Exception as e:
             self.logger.log_text(f"Failed to get initial page: {str(e)}", severity="ERROR")
@@ -38,11 +95,10 @@ class FGVSpider:
     def _parse_initial_page(self, response):
         try:
             self.logger.log_text("Parsing initial page", severity="DEBUG")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            form_data = self._get_initial_form_data(soup)
+            form_data = self._get_initial_form_data(self._form_fields(response.text))
             form_data["ctl00$txtBuscarSeries"] = ','.join(self.serie)
             for i in range(len(self.serie)):
-                form_data[f"ctl00$cphConsulta$dlsSerie$ctl0{i}$chkSerieEscolhida"] = "on"
+                form_data[f"ctl00$cphConsulta$dlsSerie$ctl{i:02d}$chkSerieEscolhida"] = "on"
             self.logger.log_text("Posting form data to initial page", severity="DEBUG")
             return self._post_form(response.url, form_data)
         except Exception as e:
@@ -52,12 +108,11 @@ class FGVSpider:
     def _parse_step2_page(self, response):
         try:
             self.logger.log_text("Parsing step 2 page", severity="DEBUG")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            form_data = self._get_step2_form_data(soup)
+            form_data = self._get_step2_form_data(self._form_fields(response.text))
             form_data["ctl00$txtBuscarSeries"] = ','.join(self.serie)
             for i in range(len(self.serie)):
-                form_data[f"ctl00$cphConsulta$dlsSerie$ctl0{i}$chkSerieEscolhida"] = "on"
-                form_data[f"ctl00$dlsSerie$ctl0{i}$chkSerieEscolhida"] = "on"
+                form_data[f"ctl00$cphConsulta$dlsSerie$ctl{i:02d}$chkSerieEscolhida"] = "on"
+                form_data[f"ctl00$dlsSerie$ctl{i:02d}$chkSerieEscolhida"] = "on"
             self.logger.log_text("Posting form data to step 2 page", severity="DEBUG")
             return self._post_form(response.url, form_data)
         except Exception as e:
@@ -67,27 +122,87 @@ class FGVSpider:
     def _parse_step3_page(self, response):
         try:
             self.logger.log_text("Parsing step 3 page", severity="DEBUG")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            form_data = self._get_step3_form_data(soup)
+            self._state = {"url": str(response.url), "fields": self._form_fields(response.text)}
+            return self._post_step3(self._state["url"], self._state["fields"])
+        except Exception as e:
+            self.logger.log_text(f"Failed to parse step 3 page: {str(e)}", severity="ERROR")
+            return None
+
+    def _post_step3(self, url, fields):
+        try:
+            form_data = self._get_step3_form_data(fields)
             form_data["ctl00$txtBuscarSeries"] = ','.join(self.serie)
             for i in range(len(self.serie)):
-                form_data[f"ctl00$dlsSerie$ctl0{i}$chkSerieEscolhida"] = "on"
-                form_data[f"ctl00$cphConsulta$dlsSerie$ctl0{i}$chkSerieEscolhida"] = "on"
+                form_data[f"ctl00$dlsSerie$ctl{i:02d}$chkSerieEscolhida"] = "on"
+                form_data[f"ctl00$cphConsulta$dlsSerie$ctl{i:02d}$chkSerieEscolhida"] = "on"
             form_data["ctl00$cphConsulta$butVisualizarResultado"] = "Visualizar e salvar"
             form_data["ctl00$txtBuscarSeries"] = ""
             self.logger.log_text("Posting form data to step 3 page", severity="DEBUG")
-            return self._post_form(response.url, form_data)
+            return self._post_form(url, form_data)
         except Exception as e:
-            self.logger.log_text(f"Failed to parse step 3 page: {str(e)}", severity="ERROR")
+            self.logger.log_text(f"Failed to post step 3 form: {str(e)}", severity="ERROR")
             return None
 
+    def _state_key(self):
+        # The checkbox indexes and the grid columns follow the order of the codes, so it is part of the key
+        return f"{VIEWSTATE_PREFIX}/{hashlib.sha1(','.join(self.serie).encode('utf-8')).hexdigest()}.json"
+
+    def _load_state(self):
+        """Cached step 2 state (url and hidden fields) of this set of series, None when absent or expired."""
+        key = self._state_key()
+        state = _viewstates.get(key)
+        if state is None:
+            try:
+                raw = get_storage().read_bytes(key)
+                state = json.loads(raw) if raw else None
+            except Exception as e:
+                self.logger.log_text(f"Failed to read cached ViewState: {str(e)}", severity="WARNING")
+        if state is None or datetime.fromisoformat(state["expires_at"]) <= datetime.now():
+            return None
+        _viewstates[key] = state
+        return state
+
+    def _save_state(self, state):
+        key = self._state_key()
+        state = state | {"period_option": self.period_option, "expires_at": (datetime.now() + SESSION_TTL).isoformat()}
+        _viewstates[key] = state
+        try:
+            get_storage().write_bytes(key, json.dumps(state).encode('utf-8'), content_type='application/json')
+        except Exception as e:
+            self.logger.log_text(f"Failed to store ViewState: {str(e)}", severity="WARNING")
+
+    def _drop_state(self):
+        key = self._state_key()
+        _viewstates.pop(key, None)
+        try:
+            get_storage().delete(key)
+        except Exception as e:
+            self.logger.log_text(f"Failed to delete cached ViewState: {str(e)}", severity="WARNING")
+
+    def _replay(self):
+        """
+        Posts step 3 straight from the cached state of this set of series (2 requests instead of 5).
+
+        :return: The results iframe response, or None when there is no cached state or the portal
+                 rejected it (no results iframe), in which case the cached state is dropped.
+        """
+        state = self._load_state()
+        if state is None:
+            return None
+        self.logger.log_text("Replaying cached ViewState", severity="DEBUG")
+        self.period_option = state.get("period_option")
+        response = self._post_step3(state["url"], state["fields"])
+        response = self._parse_results(response) if response is not None else None
+        if response is None:
+            self.logger.log_text("Cached ViewState rejected, running the full form flow", severity="WARNING")
+            self._drop_state()
+        return response
+
     def _parse_results(self, response):
         try:
             self.logger.log_text("Parsing results page", severity="DEBUG")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            iframe = soup.find('iframe', id='cphConsulta_ifrVisualizaConsulta')
-            if iframe:
-                iframe_src = iframe.get('src')
+            iframe_src = element_attribute(response.text, 'cphConsulta_ifrVisualizaConsulta', 'src')
+            if iframe_src:
                 self.logger.log_text("Getting iframe content", severity="DEBUG")
                 return self.client.get(f"https://extra-ibre.fgv.br{iframe_src}")
         except Exception as e:
@@ -97,11 +212,10 @@ class FGVSpider:
     def _parse_iframe_content(self, response):
         try:
             self.logger.log_text("Parsing iframe content", severity="DEBUG")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            table = soup.find('table', id='xgdvConsulta_DXMainTable')
-            if table:
-                tables = pd.read_html(io.StringIO(str(table)), header=0)
-                df = tables[0]
+            # The grid rows are streamed straight into typed columns, no DOM is built
+            df = results_table(response.text)
+            self.grid_empty = df is None or df.empty
+            if not self.grid_empty:
                 df = self._clean_df(df)
                 self.logger.log_text(f"DataFrame created with {len(df)} rows.", severity="DEBUG")
                 return df
@@ -118,12 +232,28 @@ class FGVSpider:
                 errors='coerce'
             )
             df.set_index('Data', drop=True, inplace=True)
-            df.columns = self.columns
+            header = [str(caption) for caption in df.columns]
+            if self.match_header:
+                codes = self._codes_from_header(header)
+                if codes is None:
+                    self.header_mismatch = True
+                    self.logger.log_text(f"Grid header {header} does not match the requested series {self.serie}", severity="WARNING")
+                    return None
+                # Columns named by code, in the order of the request
+                df.columns = codes
+                df = df[list(self.serie)]
+            else:
+                df.columns = self.columns
+                self._learn_captions(header)
             for col in df.columns:
                 df[col] = pd.to_numeric(df[col], errors='coerce')
+            stored = self._store(df)
+            if self.start_date is not None:
+                # The windowed query only returned the recent months, the store has the rest
+                df = stored
             df_date = df.index[-1].date()
             self.logger.log_text(f"Checking data update: DataFrame last date {df_date}, reference date {self.ref_date}", severity="DEBUG")
-            if df_date == self.ref_date:
+            if self.ref_date is None or df_date == self.ref_date:
                 return df
             else:
                 self.logger.log_text(f"Data not updated on source yet", severity="WARNING")
@@ -132,12 +262,84 @@ class FGVSpider:
             self.logger.log_text(f"Failed to clean DataFrame: {str(e)}", severity="ERROR")
             return None
 
-    def _get_initial_form_data(self, soup):
+    @staticmethod
+    def split(df, indicators: dict) -> dict:
+        """
+        Splits the table of a batched run (columns named by series code) back per indicator.
+
+        :param df: Result of a spider run with serie=columns=all the codes.
+        :param indicators: Mapping of indicator to (codes, columns, ref_date).
+        :return: Mapping of indicator to its DataFrame, or to None when it is not updated yet.
+        """
+        results = {}
+        for indicator, (codes, columns, ref_date) in indicators.items():
+            part = None if df is None or df.empty else df[list(codes)].dropna(how='all')
+            if part is None or part.empty or part.index[-1].date() != ref_date:
+                results[indicator] = None
+                continue
+            part.columns = columns
+            results[indicator] = part
+        return results
+
+    def _store(self, df):
+        # Each FGV series is kept in the time-series store as 'fgv/<code>', returns the merged histories
+        merged = [
+            append_delta(f"fgv/{code}", df[[col]].rename(columns={col: 'valor'}))['valor'].rename(col)
+            for code, col in zip(self.serie, self.columns)
+        ]
+        return pd.concat(merged, axis=1).rename_axis(df.index.name)
+
+    def _codes_from_header(self, header):
+        """
+        Series code of each grid column: the code written in the caption, or the caption learned
+        from single-indicator queries. None unless every requested code is matched exactly once.
+        """
+        captions = _load_captions()
+        codes = []
+        for caption in header:
+            found = [code for code in self.serie if re.search(rf'\b{re.escape(str(code))}\b', caption)]
+            codes.append(found[0] if len(found) == 1 else captions.get(caption))
+        if None in codes or sorted(codes) != sorted(self.serie):
+            return None
+        return codes
+
+    def _learn_captions(self, header):
+        # Single-indicator queries keep the positional mapping, remembered for batched queries
+        if len(header) != len(self.serie) or len(set(header)) != len(header):
+            return
+        captions = _load_captions()
+        learned = {caption: code for caption, code in zip(header, self.serie) if captions.get(caption) != code}
+        if not learned:
+            return
+        captions.update(learned)
+        try:
+            get_storage().write_bytes(CAPTIONS_KEY, json.dumps(captions).encode('utf-8'), content_type='application/json')
+        except Exception as e:
+            self.logger.log_text(f"Failed to store FGV grid captions: {str(e)}", severity="WARNING")
+
+    def _form_fields(self, text):
+        # Hidden fields of a form page, also remembering the period option the form offers
+        options = [value for value in radio_values(text, RESULT_OPTIONS) if PERIOD_OPTION.search(value)]
+        if options:
+            self.period_option = options[0]
+        return hidden_fields(text)
+
+    def _period_fields(self):
+        # Without a start date, or a period option found in the form, the query asks for the full history (rbtSerieHistorica)
+        if self.start_date is None or self.period_option is None:
+            return {}
+        return {
+            RESULT_OPTIONS: self.period_option,
+            "ctl00$cphConsulta$txtPeriodoInicio": pd.Timestamp(self.start_date).strftime('%d/%m/%Y'),
+            "ctl00$cphConsulta$txtPeriodoFim": pd.Timestamp.today().strftime('%d/%m/%Y'),
+        }
+
+    def _get_initial_form_data(self, fields):
         try:
             self.logger.log_text("Getting initial form data", severity="DEBUG")
             return {
-                "__VIEWSTATE": soup.find('input', id="__VIEWSTATE")['value'],
-                "__VIEWSTATEGENERATOR": soup.find('input', id="__VIEWSTATEGENERATOR")['value'],
+                "__VIEWSTATE": fields["__VIEWSTATE"],
+                "__VIEWSTATEGENERATOR": fields["__VIEWSTATEGENERATOR"],
                 "__VIEWSTATEENCRYPTED": '',
                 "ctl00$smg": "ctl00$updpgeral|ctl00$butBuscarSeries",
                 "ctl00$drpFiltro": "C",
@@ -157,18 +359,19 @@ class FGVSpider:
                 "ctl00$txtBAColuna": "",
                 "ctl00$txtBAIncluida": "",
                 "ctl00$txtBAAtualizada": "",
-                "ctl00$butBuscarSeries": "OK"
+                "ctl00$butBuscarSeries": "OK",
+                **self._period_fields()
             }
         except Exception as e:
             self.logger.log_text(f"Failed to get initial form data: {str(e)}", severity="ERROR")
             return None
 
-    def _get_step2_form_data(self, soup):
+    def _get_step2_form_data(self, fields):
         try:
             self.logger.log_text("Getting step 2 form data", severity="DEBUG")
             return {
-                "__VIEWSTATE": soup.find('input', id="__VIEWSTATE")['value'],
-                "__VIEWSTATEGENERATOR": soup.find('input', id="__VIEWSTATEGENERATOR")['value'],
+                "__VIEWSTATE": fields["__VIEWSTATE"],
+                "__VIEWSTATEGENERATOR": fields["__VIEWSTATEGENERATOR"],
                 "__VIEWSTATEENCRYPTED": '',
                 "ctl00$smg": "ctl00$updpBuscarSeries|ctl00$butBuscarSeriesOK",
                 "ctl00$drpFiltro": "C",
@@ -188,18 +391,19 @@ class FGVSpider:
                 "ctl00$txtBAColuna": "",
                 "ctl00$txtBAIncluida": "",
                 "ctl00$txtBAAtualizada": "",
-                "ctl00$butBuscarSeriesOK": "OK"
+                "ctl00$butBuscarSeriesOK": "OK",
+                **self._period_fields()
             }
         except Exception as e:
             self.logger.log_text(f"Failed to get step 2 form data: {str(e)}", severity="ERROR")
             return None
 
-    def _get_step3_form_data(self, soup):
+    def _get_step3_form_data(self, fields):
         try:
             self.logger.log_text("Getting step 3 form data", severity="DEBUG")
             return {
-                "__VIEWSTATE": soup.find('input', id="__VIEWSTATE")['value'],
-                "__VIEWSTATEGENERATOR": soup.find('input', id="__VIEWSTATEGENERATOR")['value'],
+                "__VIEWSTATE": fields["__VIEWSTATE"],
+                "__VIEWSTATEGENERATOR": fields["__VIEWSTATEGENERATOR"],
                 "__VIEWSTATEENCRYPTED": '',
                 "ctl00$smg": "ctl00$updpAreaConsulta|ctl00$cphConsulta$butVisualizarResultado",
                 "ctl00$drpFiltro": "E",
@@ -218,7 +422,8 @@ class FGVSpider:
                 "ctl00$rblTipoTexto": "E",
                 "ctl00$txtBAColuna": "",
                 "ctl00$txtBAIncluida": "",
-                "ctl00$txtBAAtualizada": ""
+                "ctl00$txtBAAtualizada": "",
+                **self._period_fields()
             }
         except Exception as e:
             self.logger.log_text(f"Failed to get step 3 form data: {str(e)}", severity="ERROR")
@@ -237,6 +442,40 @@ class FGVSpider:
     def run(self):
         self.logger.log_text("Running spider", severity="INFO")
 
+        result_df = self._run_once()
+        if self.start_date is not None and self.grid_empty and not self.session_rejected:
+            # The portal may not accept the period fields, the full history always works
+            self.logger.log_text(f"Windowed query from {self.start_date} returned no data grid, querying the full history", severity="WARNING")
+            self.start_date = None
+            result_df = self._run_once()
+        return result_df
+
+    def _run_once(self):
+        self.grid_empty = True
+
+        response = self._replay()
+        result_df = self._parse_iframe_content(response) if response is not None else None
+        if response is not None and self.grid_empty:
+            # The portal accepted the replayed state but returned no data, it is not reused
+            self.logger.log_text("Cached ViewState returned an empty grid, running the full form flow", severity="WARNING")
+            self._drop_state()
+            response = None
+        if response is None:
+            response = self._run_form()
+            if response is None:
+                return
+            result_df = self._parse_iframe_content(response)
+
+        if result_df is not None:
+            self.result_df = result_df
+            self.logger.log_text("Spider run completed successfully", severity="INFO")
+        else:
+            self.logger.log_text("Spider run did not produce results", severity="WARNING")
+        
+        return self.result_df
+
+    def _run_form(self):
+        """Full form flow: initial page, series search and selection, step 3 post and results iframe."""
         response = self._get_initial_page()
         if response is None:
             self.logger.log_text("Failed to get initial page", severity="ERROR")
@@ -262,11 +501,6 @@ class FGVSpider:
             self.logger.log_text("Failed to parse results page", severity="ERROR")
             return
 
-        result_df = self._parse_iframe_content(response)
-        if result_df is not None:
-            self.result_df = result_df
-            self.logger.log_text("Spider run completed successfully", severity="INFO")
-        else:
-            self.logger.log_text("Spider run did not produce results", severity="WARNING")
-        
-        return self.result_df
\ No newline at end of file
+        # The portal accepted the state, later runs over the same series replay it
+        self._save_state(self._state)
+        return response
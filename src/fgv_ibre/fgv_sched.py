@@ -1,31 +1,19 @@
-import httpx
 import pandas as pd
 from datetime import datetime
 import json
 from bs4 import BeautifulSoup
 import ast
-from google.cloud import logging as gcp_logging
-import ssl
+from utils.calendar_cache import get_calendar
+from utils.polling import today_local
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from google.cloud import logging as gcp_logging
 
-def _get_client(logger: gcp_logging.Logger):
-    try:
-        logger.log_text("Getting HTTP client", severity="DEBUG")
-        return httpx.Client(follow_redirects=True, http2=True, verify=True)
-    except Exception as e:
-        logger.log_text(f"Failed to get HTTP client: {str(e)}", severity="ERROR")
-        return None
-    
-def fetch_calendar_data(client: httpx.Client, url: str, logger: gcp_logging.Logger) -> str:
-    try:
-        response = client.get(url)
-        response.raise_for_status()  # Ensure we got a successful response
-        return response.text
-    except httpx.HTTPError as e:
-        logger.log_text(f"Failed to fetch calendar data: {str(e)}", severity="ERROR")
-        raise
-
-def parse_calendar_html(html: str, logger: gcp_logging.Logger) -> pd.DataFrame:
+CALENDAR_URL = "https://portalibre.fgv.br/calendario-de-divulgacao"
+
+
+def build_calendar(html: str, logger: "gcp_logging.Logger") -> pd.DataFrame:
     soup = BeautifulSoup(html, 'html.parser')
     calendar = soup.select("ul.calendario")
     if not calendar:
@@ -87,8 +75,13 @@ def parse_calendar_html(html: str, logger: gcp_logging.Logger) -> pd.DataFrame:
     # Correct the parsing of 'codes' and 'meta'
     df['meta'] = df['meta'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
     df['codes'] = df['codes'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+    return df
 
-    today = datetime.today().date()
+def filter_today(df: pd.DataFrame, logger: "gcp_logging.Logger") -> pd.DataFrame:
+    if df.empty:
+        return df
+
+    today = today_local()
 
     try:
         df = df.loc[(df.index == f'{today}')]
@@ -101,18 +94,16 @@ def parse_calendar_html(html: str, logger: gcp_logging.Logger) -> pd.DataFrame:
         logger.log_text("KeyError: No data for today", severity="WARNING")
         return pd.DataFrame()  # Empty DataFrame if no data for today
 
-def run_crawler(logger:gcp_logging.Logger, **kwargs) -> pd.DataFrame:
-    base_url = "https://portalibre.fgv.br/"
-    calendar_url = f"{base_url}calendario-de-divulgacao"
+def parse_calendar_html(html: str, logger: "gcp_logging.Logger") -> pd.DataFrame:
+    return filter_today(build_calendar(html, logger), logger)
 
-    client = _get_client(logger)
-    if client is None:
-        return None
-    
+def load_calendar(logger: "gcp_logging.Logger") -> pd.DataFrame:
+    """Returns the full FGV calendar of the month, from the calendar cache when possible."""
+    return get_calendar('fgv', lambda html: build_calendar(html, logger), url=CALENDAR_URL, logger=logger)
+
+def run_crawler(logger: "gcp_logging.Logger", **kwargs) -> pd.DataFrame:
     try:
-        # Now use the same session to fetch the calendar data
-        html = fetch_calendar_data(client, calendar_url, logger)
-        df = parse_calendar_html(html, logger)
+        df = filter_today(load_calendar(logger), logger)
     
         if isinstance(df, pd.DataFrame) and not df.empty:
             logger.log_text(f"{len(df)} indicators release predicted for today", severity="INFO")
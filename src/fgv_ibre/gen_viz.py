@@ -5,9 +5,12 @@ import matplotlib.dates as mdates
 from matplotlib.lines import Line2D
 import adjustText
 from io import BytesIO
-from google.cloud import logging as gcp_logging
+from typing import TYPE_CHECKING
 
-def chart_viz(df, name, subtitle, logger: gcp_logging.Logger):
+if TYPE_CHECKING:
+    from google.cloud import logging as gcp_logging
+
+def chart_viz(df, name, subtitle, logger: "gcp_logging.Logger"):
     try:
         df = df.iloc[-60:, ]
         dpi = 100
@@ -0,0 +1,245 @@
+import argparse
+import html
+import io
+import re
+import time
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+RESULTS_TABLE = 'xgdvConsulta_DXMainTable'
+
+_INPUT = re.compile(r'<input\b[^>]*>', re.IGNORECASE)
+_ATTR = re.compile(r'([\w:$-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+# Partial postbacks (UpdatePanel) send the hidden fields as |length|hiddenField|name|value|
+_DELTA_FIELD = re.compile(r'(?:^|\|)\d+\|hiddenField\|([^|]+)\|([^|]*)(?=\|)')
+
+
+def _attributes(tag: str) -> dict:
+    # finditer, unlike findall, gives None (not '') for the quote style that did not match
+    return {
+        match.group(1).lower(): html.unescape(match.group(2) if match.group(2) is not None else match.group(3))
+        for match in _ATTR.finditer(tag)
+    }
+
+
+def hidden_fields(text: str) -> dict:
+    """
+    Reads the hidden inputs of an ASP.NET page (__VIEWSTATE, __VIEWSTATEGENERATOR, ...) with
+    regular expressions, without building a DOM.
+
+    :param text: HTML of a full page, or the body of a partial postback.
+    :return: Mapping of field id (or name) to value.
+    """
+    fields = {}
+    for tag in _INPUT.findall(text):
+        attributes = _attributes(tag)
+        if attributes.get('type', '').lower() == 'hidden':
+            fields[attributes.get('id') or attributes.get('name')] = attributes.get('value', '')
+    if '|hiddenField|' in text:
+        fields.update(_DELTA_FIELD.findall(text))
+    return fields
+
+
+def radio_values(text: str, name: str) -> list[str]:
+    """Values of the radio inputs of a group, in page order."""
+    values = []
+    for tag in _INPUT.findall(text):
+        attributes = _attributes(tag)
+        if attributes.get('type', '').lower() == 'radio' and attributes.get('name') == name:
+            values.append(attributes.get('value', ''))
+    return values
+
+
+def element_attribute(text: str, element_id: str, attribute: str) -> str | None:
+    """Value of an attribute of the first tag with the given id, e.g. the src of an iframe."""
+    match = re.search(rf'<[a-z]+\b[^>]*\bid\s*=\s*["\']{re.escape(element_id)}["\'][^>]*>', text, re.IGNORECASE)
+    return _attributes(match.group(0)).get(attribute.lower()) if match else None
+
+
+class _GridTarget:
+    """
+    lxml parser target collecting the cell texts of one table, rows of nested tables included
+    in the text of the cell holding them (as pd.read_html does).
+    """
+
+    def __init__(self, table_id):
+        self.table_id = table_id
+        self.depth = 0
+        self.rows = []
+        self.cell = None
+
+    def start(self, tag, attrib):
+        if tag == 'table':
+            if self.depth or attrib.get('id') == self.table_id:
+                self.depth += 1
+        elif self.depth == 1:
+            if tag == 'tr':
+                self.rows.append([])
+            elif tag in ('td', 'th') and self.rows:
+                self.cell = []
+
+    def end(self, tag):
+        if tag == 'table' and self.depth:
+            self.depth -= 1
+        elif self.depth == 1 and tag in ('td', 'th') and self.cell is not None:
+            self.rows[-1].append(' '.join(''.join(self.cell).split()))
+            self.cell = None
+
+    def data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+    def close(self):
+        return self.rows
+
+
+def table_rows(text: str, table_id: str = RESULTS_TABLE) -> list[list[str]]:
+    """Cell texts of each row of a table, read with a streaming lxml parser target (no tree is built)."""
+    parser = etree.HTMLParser(target=_GridTarget(table_id))
+    parser.feed(text)
+    return parser.close()
+
+
+def results_table(text: str, table_id: str = RESULTS_TABLE) -> pd.DataFrame | None:
+    """
+    Reads the FGV results grid into a DataFrame.
+
+    The first row is the header. The first column ('Data') is kept as text, the value columns are
+    converted to float arrays (American format, ',' as thousands separator).
+
+    :return: DataFrame, or None when the page has no such table.
+    """
+    rows = table_rows(text, table_id)
+    if not rows:
+        return None
+    header, body = rows[0], [row for row in rows[1:] if len(row) == len(rows[0])]
+    # Repeated captions are numbered as pd.read_html does ('X', 'X.1'), so no column is lost
+    seen = {}
+    for i, name in enumerate(header):
+        seen[name] = seen.get(name, -1) + 1
+        header[i] = f"{name}.{seen[name]}" if seen[name] else name
+    columns = {header[0]: np.array([row[0] for row in body], dtype=object)}
+    for i, name in enumerate(header[1:], start=1):
+        values = pd.Series([row[i].replace(',', '') for row in body], dtype=object)
+        columns[name] = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    return pd.DataFrame(columns)
+
+
+def _synthetic_page(rows: int, series: int) -> str:
+    # Same shape as the portal's grid: DevExpress header cells wrap their caption in a nested table
+    header = ''.join(
+        f'<td class="dxgvHeader"><table><tr><td>Serie {i}</td></tr></table></td>' for i in range(series)
+    )
+    months = pd.date_range(end=pd.Timestamp.today(), periods=rows, freq='MS')
+    rng = np.random.default_rng(0)
+    body = ''.join(
+        f'<tr class="dxgvDataRow"><td>{month:%m/%Y}</td>'
+        + ''.join(f'<td>{value:,.2f}</td>' for value in rng.normal(100, 10, series))
+        + '</tr>'
+        for month in months
+    )
+    viewstate = 'x' * 200_000
+    return (
+        f'<html><body><form><input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />'
+        '<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="CA0B0334" />'
+        f'<table id="{RESULTS_TABLE}"><tr><td class="dxgvHeader">Data</td>{header}</tr>{body}</table>'
+        '</form></body></html>'
+    )
+
+
+# Saved snippets of portal markup (both quote styles and a partial postback), checked by --check
+_SNIPPETS = [
+    (
+        '<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="/wEPD&amp;w=" />'
+        "<input type='hidden' name='__VIEWSTATEGENERATOR' id='__VIEWSTATEGENERATOR' value='CA0B0334' />"
+        '<input type="radio" name="ctl00$cphConsulta$gnResultado" value="rbtSerieHistorica" checked="checked" />'
+        "<input type='radio' name='ctl00$cphConsulta$gnResultado' value='rbtPeriodo' />"
+        "<iframe id='cphConsulta_ifrVisualizaConsulta' src='/IBRE/sitefgvdados/VisualizaConsulta.aspx?q=1&amp;r=2'></iframe>",
+        {
+            'hidden': {'__VIEWSTATE': '/wEPD&w=', '__VIEWSTATEGENERATOR': 'CA0B0334'},
+            'radio': ['rbtSerieHistorica', 'rbtPeriodo'],
+            'src': '/IBRE/sitefgvdados/VisualizaConsulta.aspx?q=1&r=2',
+        },
+    ),
+    (
+        '1|#||4|20|updatePanel|ctl00_updpgeral|<div></div>|8|hiddenField|__VIEWSTATE|/wEPDw==|8|hiddenField|__VIEWSTATEGENERATOR|CA0B0334|',
+        {'hidden': {'__VIEWSTATE': '/wEPDw==', '__VIEWSTATEGENERATOR': 'CA0B0334'}},
+    ),
+]
+
+
+def check() -> bool:
+    """Runs the extraction on the saved snippets and prints any mismatch."""
+    ok = True
+    for text, expected in _SNIPPETS:
+        results = {
+            'hidden': hidden_fields(text),
+            'radio': radio_values(text, 'ctl00$cphConsulta$gnResultado'),
+            'src': element_attribute(text, 'cphConsulta_ifrVisualizaConsulta', 'src'),
+        }
+        for name, value in expected.items():
+            if results[name] != value:
+                print(f"{name}: expected {value!r}, got {results[name]!r}")
+                ok = False
+    grid = results_table(f'<table id="{RESULTS_TABLE}"><tr><td>Data</td><td>X</td><td>X</td></tr><tr><td>01/2024</td><td>1,000.5</td><td>2</td></tr></table>')
+    if list(grid.columns) != ['Data', 'X', 'X.1'] or grid['X'].tolist() != [1000.5]:
+        print(f"results grid: got {grid.to_dict('list')}")
+        ok = False
+    print("Extraction checks passed" if ok else "Extraction checks failed")
+    return ok
+
+
+def benchmark(pages: dict, repeat: int = 20):
+    """
+    Times the BeautifulSoup steps the spider used to run against this module, per page.
+
+    :param pages: Mapping of label to page HTML (saved portal pages or synthetic ones).
+    :param repeat: Runs per measurement, the best one is reported.
+    """
+    from bs4 import BeautifulSoup
+
+    def best(func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def soup_fields(text):
+        soup = BeautifulSoup(text, 'html.parser')
+        return soup.find('input', id="__VIEWSTATE")['value'], soup.find('input', id="__VIEWSTATEGENERATOR")['value']
+
+    def soup_table(text):
+        table = BeautifulSoup(text, 'html.parser').find('table', id=RESULTS_TABLE)
+        return pd.read_html(io.StringIO(str(table)), header=0)[0] if table else None
+
+    print(f"{'page':<30}{'step':<16}{'bs4 ms':>10}{'extract ms':>12}{'speedup':>9}")
+    for label, text in pages.items():
+        steps = [("hidden fields", soup_fields, hidden_fields)]
+        if RESULTS_TABLE in text:
+            steps.append(("results grid", soup_table, results_table))
+        for step, before, after in steps:
+            old, new = best(lambda: before(text)), best(lambda: after(text))
+            print(f"{label[-30:]:<30}{step:<16}{old:>10.2f}{new:>12.2f}{old / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the FGV page extraction.")
+    parser.add_argument("pages", nargs="*", help="Saved portal pages (form steps or results iframe)")
+    parser.add_argument("--rows", type=int, default=400, help="Months of the synthetic results page, used without pages")
+    parser.add_argument("--series", type=int, default=4, help="Series of the synthetic results page")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement")
+    parser.add_argument("--check", action="store_true", help="Only check the extraction on saved snippets")
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(0 if check() else 1)
+    if args.pages:
+        pages = {}
+        for path in args.pages:
+            with open(path, encoding='utf-8', errors='replace') as file:
+                pages[path] = file.read()
+    else:
+        pages = {f"synthetic {args.rows}x{args.series}": _synthetic_page(args.rows, args.series)}
+    benchmark(pages, args.repeat)
@@ -28,7 +28,7 @@ def gen_text(df, title, emojis):
     tweet += "\nFonte: @FGVIBRE"
     return tweet
 
-def create_tweet(text, image_path, image_buffer):
+def create_tweet(text, image_path, image_buffer, sla=None):
     # Retrieve environment variables
     consumer_key = os.environ.get("CONSUMER_KEY")
     consumer_secret = os.environ.get("CONSUMER_SECRET")
@@ -51,8 +51,12 @@ def create_tweet(text, image_path, image_buffer):
 
     # Upload image to Twitter. Replace 'filename' your image filename.
     media_id = api.media_upload(filename=f"{image_path}", file=image_buffer).media_id_string
+    if sla:
+        sla.mark("media_uploaded")
     # print(media_id)
 
     # Send Tweet with Text and media ID
     client.create_tweet(text=text, media_ids=[media_id])
+    if sla:
+        sla.mark("tweeted")
     print("Tweeted!")
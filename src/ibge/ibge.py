@@ -1,4 +1,5 @@
 import pandas as pd
+from src.ibge.sidra import get_table, latest_period
 
 
 def get_ibge_index(indicador, referencia, table, v, d, name):
@@ -12,24 +13,13 @@ def get_ibge_index(indicador, referencia, table, v, d, name):
         pandas.DataFrame: Processed index data with two columns: 'valor' (numeric values) and 'ano_mes' (datetime values).
                           The 'ano_mes' column is set as the index of the DataFrame.
     """
-    # setting url endpoint
-    url = (
-    "https://apisidra.ibge.gov.br/values/"
-    f"t/{table}/"
-    "n1/all/"
-    f"v/{v}/"
-    f"p/all/{d}"
-    )
-    # Read JSON data from the API endpoint
-    df = pd.read_json(url)[ ["V", "D3C", "D2N"] ]
-    df = df[1:].rename(columns={'V': 'valor', 'D3C': 'ano_mes'})
-    #Converting columns formatting
-    df["ano_mes"] = pd.to_datetime(df["ano_mes"], format="%Y%m")
-    df["valor"] = pd.to_numeric(df["valor"], errors="coerce", downcast='float')
-    # Drop rows with missing values. Set 'ano_mes' column as the DataFrame index
-    df.dropna(inplace=True)  
-    df.set_index("ano_mes", drop=True, inplace=True)
-    df = df.pivot_table(index=df.index, columns='D2N', values='valor', aggfunc='first').dropna()
+    # The full fetch only runs once the last period shows the new reference
+    latest = latest_period(table, v, d)
+    if latest is None or latest.date() != referencia.date():
+        print('Dados não atualizados na fonte')
+        return None
+
+    df = get_table(table, v, d, referencia)
 
     # return df
     if df.index[-1].date() == referencia.date():
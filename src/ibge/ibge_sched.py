@@ -1,15 +1,14 @@
-import httpx
 import pandas as pd
 from datetime import datetime
 from bs4 import BeautifulSoup
+from utils.calendar_cache import get_calendar
+from utils.polling import today_local
 
-def fetch_calendar_data(url: str) -> str:
-    with httpx.Client(follow_redirects=True) as client:
-        response = client.get(url)
-        response.raise_for_status()  # Ensure we got a successful response
-        return response.text
+CALENDAR_URL = "https://www.ibge.gov.br/calendario/mensal.html"
+# IBGE publishes its releases at 9h (Brasília time); the monthly calendar only gives the day
+RELEASE_TIME = "09:00"
 
-def parse_calendar_html(html: str) -> pd.DataFrame:
+def build_calendar(html: str) -> pd.DataFrame:
     soup = BeautifulSoup(html, 'html.parser')
     calendar = soup.select("ul.agenda--lista")
     title_elements = calendar[0].select("div.agenda--lista__evento")
@@ -39,8 +38,10 @@ def parse_calendar_html(html: str) -> pd.DataFrame:
     df.set_index('divulgacao', drop=True, inplace=True)
     df = df.drop('indicator', axis=1)
     df = df.dropna().sort_index(ascending=True)
+    return df
 
-    today = datetime.today().date()
+def filter_today(df: pd.DataFrame) -> pd.DataFrame:
+    today = today_local()
 
     try:
         df = df.loc[f'{today}']
@@ -48,10 +49,15 @@ def parse_calendar_html(html: str) -> pd.DataFrame:
     except KeyError:
         return pd.DataFrame()  # Empty DataFrame if no data for today
 
+def parse_calendar_html(html: str) -> pd.DataFrame:
+    return filter_today(build_calendar(html))
+
+def load_calendar(logger=None) -> pd.DataFrame:
+    """Returns the full IBGE calendar of the month, from the calendar cache when possible."""
+    return get_calendar('ibge', build_calendar, url=CALENDAR_URL, logger=logger)
+
 def run_crawler(logger=None, **kwargs) -> pd.DataFrame:
-    url = "https://www.ibge.gov.br/calendario/mensal.html"
-    html = fetch_calendar_data(url)
-    df = parse_calendar_html(html)
+    df = filter_today(load_calendar(logger))
     
     if isinstance(df, pd.DataFrame) and not df.empty:
         if logger:
@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from utils.http_conn import get
+from utils.ts_store import append_delta, last_observation
+
+SIDRA_URL = "https://apisidra.ibge.gov.br/values/t/{table}/n1/all/v/{v}/p/{periods}/{d}"
+SIDRA_WORKERS = 4
+# Periods requested for a table that was never stored: 13 charted periods plus a year of margin
+HISTORY_PERIODS = int(os.environ.get('SIDRA_HISTORY_PERIODS', 25))
+# Stored periods this recent are requested again, since the IBGE revises recent values
+REVISION_PERIODS = 12
+
+
+def get_values(table, v, d, periods: str) -> pd.DataFrame:
+    """
+    Requests a SIDRA table over the shared HTTP client (pooled, with timeouts and retries).
+
+    :param periods: SIDRA period selector, e.g. 'last 13', 'all' or '202401-202412'.
+    :return: DataFrame indexed by period ('ano_mes'), one column per variable (D2N).
+    """
+    response = get(SIDRA_URL.format(table=table, v=v, periods=periods.replace(' ', '%20'), d=d))
+    response.raise_for_status()
+    df = pd.DataFrame(response.json())[ ["V", "D3C", "D2N"] ]
+    df = df[1:].rename(columns={'V': 'valor', 'D3C': 'ano_mes'})
+    #Converting columns formatting
+    df["ano_mes"] = pd.to_datetime(df["ano_mes"], format="%Y%m")
+    df["valor"] = pd.to_numeric(df["valor"], errors="coerce", downcast='float')
+    # Drop rows with missing values. Set 'ano_mes' column as the DataFrame index
+    df.dropna(inplace=True)
+    df.set_index("ano_mes", drop=True, inplace=True)
+    return df.pivot_table(index=df.index, columns='D2N', values='valor', aggfunc='first').dropna()
+
+
+def latest_period(table, v, d) -> pd.Timestamp | None:
+    """Cheap freshness check: the newest period of a table, from a p/last 1 request."""
+    df = get_values(table, v, d, "last 1")
+    return None if df.empty else df.index.max()
+
+
+def get_table(table, v, d, reference: pd.Timestamp = None) -> pd.DataFrame:
+    """
+    Returns the stored history of a table updated with its trailing periods (p/last N).
+
+    N covers the periods since the last stored one plus REVISION_PERIODS, or HISTORY_PERIODS
+    when the table was never stored. The result is upserted into the time-series store.
+    """
+    series = f"sidra/{table}/{v}/{d}"
+    last = last_observation(series)
+    if last is None:
+        periods = HISTORY_PERIODS
+    else:
+        reference = pd.Timestamp(reference or pd.Timestamp.today())
+        periods = max(0, (reference.year - last.year) * 12 + reference.month - last.month) + REVISION_PERIODS
+    return append_delta(series, get_values(table, v, d, f"last {periods}")).copy()
+
+
+def get_batch(fetch, items: dict) -> dict:
+    """
+    Runs fetch(**kwargs) for several tables concurrently.
+
+    :param fetch: Callable fetching one table, e.g. src.ibge.ibge.get_ibge_index.
+    :param items: Mapping of name to the keyword arguments of fetch.
+    :return: Mapping of name to the result, or to the exception raised for that table.
+    """
+    if not items:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(SIDRA_WORKERS, len(items))) as executor:
+        futures = {name: executor.submit(fetch, **kwargs) for name, kwargs in items.items()}
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            results[name] = e
+    return results
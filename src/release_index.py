@@ -0,0 +1,168 @@
+import json
+import os
+import re
+from datetime import datetime, timedelta
+import pandas as pd
+from utils.calendar_cache import DEFAULT_TTL
+from utils.storage_conn import get_storage
+from utils.polling import now_local
+
+INDEX_PREFIX = 'release-index'
+DUE_WINDOW_HOURS = float(os.environ.get('DUE_WINDOW_HOURS', 1))
+
+# Warm instances keep the index they already read or built
+_memory = {}
+
+
+def parse_time(text) -> str | None:
+    """Extracts an 'HH:MM' release time from calendar texts such as '8h', '11h30' or '09:00'."""
+    match = re.search(r'(\d{1,2})\s*[h:]\s*(\d{2})?', str(text or ''))
+    if not match:
+        return None
+    return f"{int(match.group(1)):02d}:{match.group(2) or '00'}"
+
+
+class ReleaseIndex:
+    """
+    Upcoming releases of every source, bucketed by day, in Brasília time.
+
+    Entries are dictionaries with 'source', 'indicator', 'date' ('YYYY-MM-DD') and 'time'
+    ('HH:MM', or None when the calendar only gives the day). A due query only looks at the
+    buckets of the days inside the window, so it does not depend on the size of the calendars.
+    Sources whose calendar could not be read are listed in 'unknown' and always reported as due.
+    """
+
+    def __init__(self, entries: list[dict], unknown: list[str] = None, built_at: str = None):
+        self.entries = entries
+        self.unknown = unknown or []
+        self.built_at = built_at or datetime.now().isoformat()
+        self._by_day = {}
+        for entry in entries:
+            self._by_day.setdefault(entry['date'], []).append(entry)
+
+    def due(self, hours: float = DUE_WINDOW_HOURS, now: datetime = None) -> list[dict]:
+        """
+        Returns the releases of today that are already out or come out within the next hours,
+        plus the releases of the following days inside the window.
+        """
+        now = now or now_local()
+        end = now + timedelta(hours=hours)
+        due = []
+        day = now.date()
+        while day <= end.date():
+            for entry in self._by_day.get(day.isoformat(), []):
+                if entry['time'] is None or datetime.fromisoformat(f"{entry['date']}T{entry['time']}") <= end:
+                    due.append(entry)
+            day += timedelta(days=1)
+        return due
+
+    def due_sources(self, hours: float = DUE_WINDOW_HOURS, now: datetime = None) -> set:
+        return {entry['source'] for entry in self.due(hours, now)} | set(self.unknown)
+
+    def to_json(self) -> str:
+        return json.dumps({'built_at': self.built_at, 'unknown': self.unknown, 'entries': self.entries})
+
+    @classmethod
+    def from_json(cls, raw) -> 'ReleaseIndex':
+        data = json.loads(raw)
+        return cls(data['entries'], data.get('unknown'), data.get('built_at'))
+
+
+def _entries(source, dates, indicators, times=None) -> list[dict]:
+    times = times if times is not None else [None] * len(dates)
+    return [
+        {'source': source, 'indicator': str(indicator), 'date': pd.Timestamp(date).date().isoformat(), 'time': time}
+        for date, indicator, time in zip(dates, indicators, times)
+    ]
+
+
+def _bcb_entries(logger):
+    from src.bcb.bcb_sched import load_calendar
+    cat_bcb = pd.read_json('src/bcb/cat_bcb.json')
+    df = load_calendar('mes', logger).reset_index().merge(cat_bcb, on='evento')
+    times = df['hora'].where(df['hora'].notna(), None).tolist() if 'hora' in df else None
+    return _entries('bcb', df['dataEvento'], df['category'], times)
+
+
+def _fgv_entries(logger):
+    from src.fgv_ibre.fgv_sched import load_calendar
+    df = load_calendar(logger)
+    return _entries('fgv', df.index, df['title'], [parse_time(hora) for hora in df['hora']])
+
+
+def _ibge_entries(logger):
+    from src.ibge.ibge_sched import load_calendar, RELEASE_TIME
+    df = load_calendar(logger)
+    return _entries('ibge', df.index, df['name'], [RELEASE_TIME] * len(df))
+
+
+def _anfavea_entries(logger):
+    from src.anfavea.anfa_calendar import load_calendar
+    df = load_calendar(logger)
+    return _entries('anfavea', df.index, df['title'])
+
+
+def _abicom_entries(logger):
+    # ABICOM publishes the PPI every business day, there is no calendar to read
+    today = now_local().date()
+    days = pd.bdate_range(start=today.replace(day=1), end=today + timedelta(days=40))
+    return _entries('abicom', days, ['ppi'] * len(days))
+
+
+SOURCES = {
+    'bcb': _bcb_entries,
+    'fgv': _fgv_entries,
+    'ibge': _ibge_entries,
+    'anfavea': _anfavea_entries,
+    'abicom': _abicom_entries,
+}
+
+
+def build_index(logger=None) -> ReleaseIndex:
+    """Merges the cached calendars of every source into a ReleaseIndex."""
+    entries, unknown = [], []
+    for source, load in SOURCES.items():
+        try:
+            entries += load(logger)
+        except Exception as e:
+            unknown.append(source)
+            if logger:
+                logger.log_text(f"Failed to index {source} calendar: {str(e)}", severity="WARNING")
+    return ReleaseIndex(entries, unknown)
+
+
+def load_index(logger=None, ttl: timedelta = DEFAULT_TTL, storage=None) -> ReleaseIndex:
+    """
+    Returns the release index of the current month.
+
+    The index is precomputed and stored as release-index/<YYYY-MM>.json in the 'tt-bot' bucket
+    (or under STORAGE_DIR), so an idle invocation reads a single small file. It is rebuilt from
+    the calendars once it is older than ttl. Indexes with unknown sources are not stored.
+    """
+    now = datetime.now()
+    key = f"{INDEX_PREFIX}/{now.strftime('%Y-%m')}.json"
+    index = _memory.get(key)
+    try:
+        storage = storage or get_storage()
+        if index is None:
+            raw = storage.read_bytes(key)
+            index = ReleaseIndex.from_json(raw) if raw else None
+    except Exception as e:
+        storage = None
+        if logger:
+            logger.log_text(f"Failed to read release index: {str(e)}", severity="WARNING")
+
+    if index is not None and now - datetime.fromisoformat(index.built_at) < ttl:
+        _memory[key] = index
+        return index
+
+    index = build_index(logger)
+    if not index.unknown:
+        _memory[key] = index
+        if storage is not None:
+            try:
+                storage.write_bytes(key, index.to_json().encode('utf-8'), content_type='application/json')
+            except Exception as e:
+                if logger:
+                    logger.log_text(f"Failed to write release index: {str(e)}", severity="WARNING")
+    return index
@@ -1,35 +1,44 @@
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from src.anfavea.anfa_calendar import check_release_date
-from src.anfavea.anfa import get_xls_link, read_excel
-from src.anfavea.tweet import twt_text, create_tweet
-from src.anfavea.gen_viz import viz_anfavea
-from utils.bucket_conn import update_logs_conn
+from src.anfavea.anfa import get_xls_link, read_excel, workbook_updated_since
+from utils.orchestrator import render_lock
+from utils.sla_conn import SlaRecord
 
-def run_anfa(logger, logs_df):
+def run_anfa(logger, ledger):
     logger.log_text("Starting ANFAVEA scheduler crawler", severity="INFO")
     today = datetime.today().date()
     title = 'anfavea'
 
-    if title in logs_df['indicator'].values:
+    if title in ledger:
         logger.log_text(f"Indicator already tweeted: {title}", severity="INFO")
         return (f"ANFAVEA Scheduler: 1 indicator already tweeted")
 
     release_date = check_release_date()
     if release_date == today:
+        # Rendering and posting dependencies are only imported when there is a release to process
+        from src.anfavea.tweet import twt_text, create_tweet
+        from src.anfavea.gen_viz import viz_anfavea
+        sla = SlaRecord("anfavea", title)
         try:
             link = get_xls_link()
+            if not workbook_updated_since(link, release_date):
+                logger.log_text(f"Workbook for {title} not updated on source yet", severity="INFO")
+                return (f"ANFAVEA Scheduler: indicator not updated on source")
             df = read_excel(link)
+            sla.mark("fetched")
             last_db_date = df.index[-1].month
             last_release_date = (today - relativedelta(months=1)).month
             if last_db_date == last_release_date:
                 text = twt_text(df)
-                img_buff = viz_anfavea(df)
-                create_tweet(text=text, image_path=f"{title}", image_buffer=img_buff)
+                with render_lock:
+                    img_buff = viz_anfavea(df)
+                sla.mark("rendered")
+                create_tweet(text=text, image_path=f"{title}", image_buffer=img_buff, sla=sla)
                 img_buff.close()
+                sla.save()
                 logger.log_text(f"Tweet created and sent for {title}", severity="INFO")
-                logs_df.loc[len(logs_df)] = {"source": "anfavea", "indicator": title, "posted": True}
-                update_logs_conn(logs_df)
+                ledger.append("anfavea", title)
                 return (f"ANFAVEA Scheduler: 1 new indicator processed")
             else:
                 logger.log_text(f"Data for {title} does not match expected month", severity="WARNING")
@@ -1,12 +1,16 @@
 import pandas as pd
 from src.bcb.bcb_sched import bcb_calendar
 from src.bcb.bcb import get_bc_serie
-from src.bcb.tweet import text_fiscais, text_pct, text_cambio, create_tweet, text_credito, text_juros, text_credito_livredir, text_correntes, text_m2
-from src.bcb.gen_viz import viz_fiscais, viz_pct, viz_cambio, viz_externo, viz_credito, viz_juros, viz_credito_livredir, viz_correntes, viz_m2
-from utils.bucket_conn import update_logs_conn
+from utils.orchestrator import render_lock
+from utils.polling import poll, release_datetime, now_local, source_deadline
+from utils.sla_conn import SlaRecord
 
 
-def run_bcb(logs_df, logger = None):
+def _load_functions():
+    # Rendering and posting dependencies are only imported when there is a release to process
+    from src.bcb.tweet import text_fiscais, text_pct, text_cambio, text_credito, text_juros, text_credito_livredir, text_correntes, text_m2
+    from src.bcb.gen_viz import viz_fiscais, viz_pct, viz_cambio, viz_externo, viz_credito, viz_juros, viz_credito_livredir, viz_correntes, viz_m2
+
     viz_functions = {
         "viz_fiscais": viz_fiscais,
         "viz_pct": viz_pct,
@@ -29,7 +33,13 @@ def run_bcb(logs_df, logger = None):
         "text_correntes": text_correntes,
         "text_m2": text_m2
     }
+    return viz_functions, txt_functions
+
+
+def run_bcb(ledger, logger = None):
     logger.log_text("Starting BCB scheduler crawler", severity="INFO")
+    # Polling of every indicator shares the source budget
+    deadline = source_deadline("bcb")
 
     cat_bcb = pd.read_json('src/bcb/cat_bcb.json')
 
@@ -50,13 +60,16 @@ def run_bcb(logs_df, logger = None):
 
     df = df.apply(lambda x: x.map(lambda y: y.isoformat() if isinstance(y, pd.Timestamp) else y))
 
+    from src.bcb.tweet import create_tweet
+    viz_functions, txt_functions = _load_functions()
+
     processed_count = 0
     errors = []
     already_tweeted = []
 
     for index, row in df.iterrows():    
         name = row['category']
-        if name in logs_df['indicator'].values:  # Check if the indicator is already logged
+        if name in ledger:  # Check if the indicator is already logged
             logger.log_text(f"Indicator already tweeted: {name}", severity="INFO")
             already_tweeted.append(name)
             continue
@@ -69,26 +82,33 @@ def run_bcb(logs_df, logger = None):
         chart = row['chart']
         text = row['text']
         subtitle = row['subtitle']
+        # Series compared with fixed past dates (e.g. M2 since 2019) set their own start in cat_bcb.json
+        start = row['inicio'] if 'inicio' in row and isinstance(row['inicio'], str) else None
+        release_at = release_datetime(now_local().date(), row.get('hora'))
         
         logger.log_text(f"Running BCB crawler for {name}", severity="INFO")
+        sla = SlaRecord("bcb", name, release_at)
         try:
-            df = get_bc_serie(series, name, colunas, reference, raw, mult)
+            df = poll(lambda: get_bc_serie(series, name, colunas, reference, raw, mult, start), release_at, logger=logger, name=name, deadline=deadline)
             print(df)
             
             if df is None or not isinstance(df, pd.DataFrame) or df.empty or df.isna().all().all():
                 logger.log_text(f"No valid DataFrame returned for cleaning for {name}", severity="WARNING")
                 continue
 
+            sla.mark("fetched")
             gen_text = txt_functions.get(text)
             gen_viz_bcb = viz_functions.get(chart)
             twt_text = gen_text(df, name)
-            chart = gen_viz_bcb(df, name, subtitle)
-            create_tweet(twt_text, image_path=f"{name}", image_buffer=chart)
+            with render_lock:
+                chart = gen_viz_bcb(df, name, subtitle)
+            sla.mark("rendered")
+            create_tweet(twt_text, image_path=f"{name}", image_buffer=chart, sla=sla)
             chart.close()
+            sla.save()
             
             logger.log_text(f"Tweet created and sent for {name}", severity="INFO")
-            logs_df.loc[len(logs_df)] = {"source": "bcb", "indicator": name, "posted": True}
-            update_logs_conn(logs_df)
+            ledger.append("bcb", name)
             processed_count += 1
         except Exception as e:
             logger.log_text(f"Failed to process data of indicator: {name} - {str(e)}", severity="ERROR")
@@ -1,14 +1,15 @@
 import pandas as pd
 import os
-from src.fgv_ibre.client_login import FGVPortalClient
-from src.fgv_ibre.fgv_ibre import FGVSpider
 from src.fgv_ibre.fgv_sched import run_crawler
-from src.fgv_ibre.gen_viz import chart_viz
-from src.fgv_ibre.tweet import gen_text, create_tweet
-from utils.bucket_conn import update_logs_conn
+from utils.orchestrator import render_lock
+from utils.polling import poll, release_datetime, now_local, source_deadline
+from utils.sla_conn import SlaRecord
+from src.release_index import parse_time
 
-def run_fgv_scheduler(logger, logs_df):
+def run_fgv_scheduler(logger, ledger):
     logger.log_text("Starting FGV scheduler crawler", severity="INFO")
+    # Polling of every indicator shares the source budget
+    deadline = source_deadline("fgv")
 
     df = run_crawler(logger=logger)
 
@@ -18,6 +19,49 @@ def run_fgv_scheduler(logger, logs_df):
 
     df = df.apply(lambda x: x.map(lambda y: y.isoformat() if isinstance(y, pd.Timestamp) else y))
 
+    # Crawling, rendering and posting dependencies are only imported when there is a release to process
+    from src.fgv_ibre.client_login import get_session
+    from src.fgv_ibre.fgv_ibre import FGVSpider, window_start
+    from src.fgv_ibre.gen_viz import chart_viz
+    from src.fgv_ibre.tweet import gen_text, create_tweet
+
+    fgv_user = os.environ.get("FGV_USER")
+    fgv_password = os.environ.get("FGV_PASSWORD")
+
+    def fetch(codes, columns, ref_date, match_header=False):
+        # The portal session is shared by every indicator and reused across invocations
+        client = get_session(fgv_user, fgv_password, logger)
+        if not client:
+            raise RuntimeError("FGV portal login failed")
+        # Series already in the time-series store are only queried for their recent months
+        spider = FGVSpider(client=client, serie=codes, columns=columns, logger=logger, ref_date=ref_date, start_date=window_start(codes), match_header=match_header)
+        result = spider.run()
+        if spider.session_rejected:
+            logger.log_text("Stored FGV session rejected, logging in again", severity="WARNING")
+            spider.client = get_session(fgv_user, fgv_password, logger, refresh=True)
+            result = spider.run() if spider.client else None
+        if spider.header_mismatch:
+            raise RuntimeError("grid header does not match the requested series")
+        return result if result is not None and not result.empty else None
+
+    # Indicators already past their release time are queried together in one form session,
+    # the ones still missing afterwards are polled one by one
+    now = now_local()
+    batch = {}
+    for _, row in df.iterrows():
+        release_at = release_datetime(now.date(), parse_time(row['hora']))
+        if row['title'] not in ledger and (release_at is None or release_at <= now):
+            batch[row['title']] = (row['codes'], row['meta'], pd.to_datetime(row['reference']).date())
+    prefetched = {}
+    if len(batch) > 1:
+        codes = list(dict.fromkeys(code for item in batch.values() for code in item[0]))
+        logger.log_text(f"Running batched FGVSpider for {len(batch)} indicators", severity="INFO")
+        try:
+            # Columns are matched by the grid header, a mismatch falls back to one query per indicator
+            prefetched = FGVSpider.split(fetch(codes, codes, None, match_header=True), batch)
+        except Exception as e:
+            logger.log_text(f"Batched FGVSpider failed, querying indicators one by one: {str(e)}", severity="WARNING")
+
     processed_count = 0
     error_count = 0
     already_tweeted = 0
@@ -25,40 +69,45 @@ def run_fgv_scheduler(logger, logs_df):
 
     for _, row in df.iterrows():    
         title = row['title']
-        if title in logs_df['indicator'].values:  # Check if the indicator is already logged
+        if title in ledger:  # Check if the indicator is already logged
             logger.log_text(f"Indicator already tweeted: {title}", severity="INFO")
             already_tweeted += 1
             continue
 
         codes = row['codes']
         ct_titles = row['meta']
-        sched_time = f'{row["hora"][0]} {row["hora"][-1] if row["hora"][-1] else 0}'
+        release_at = release_datetime(now_local().date(), parse_time(row['hora']))
+        sched_time = f"{release_at:%H:%M}" if release_at else row['hora']
         ref_date = pd.to_datetime(row['reference']).date()
         name = row['name']
         subtitle = row['subtitle']
         emojis = row['emojis']
 
         logger.log_text(f"Running FGVSpider for {title} at {sched_time}", severity="INFO")
+        sla = SlaRecord("fgv", title, release_at)
         try:
-            fgv_user = os.environ.get("FGV_USER")
-            fgv_password = os.environ.get("FGV_PASSWORD")
-            fgv_portal = FGVPortalClient(gcp_logging_client=logger)
-            client = fgv_portal.login(fgv_user, fgv_password)
-            spider = FGVSpider(client=client, serie=codes, columns=ct_titles, logger=logger, ref_date=ref_date)
-            result_df = spider.run()
+            def check():
+                if title in prefetched:
+                    return prefetched.pop(title)
+                return fetch(codes, ct_titles, ref_date)
+
+            result_df = poll(check, release_at, logger=logger, name=title, deadline=deadline)
             if result_df is None or result_df.empty:
                 logger.log_text(f"Spider returned no data for {title}", severity="WARNING")
                 spider_no_data += 1
                 continue
 
+            sla.mark("fetched")
             try:
                 twt_text = gen_text(result_df, title, emojis)
-                img_buff = chart_viz(result_df, name, subtitle, logger)
-                create_tweet(text=twt_text, image_path=f"{title}", image_buffer=img_buff)
+                with render_lock:
+                    img_buff = chart_viz(result_df, name, subtitle, logger)
+                sla.mark("rendered")
+                create_tweet(text=twt_text, image_path=f"{title}", image_buffer=img_buff, sla=sla)
                 img_buff.close()
+                sla.save()
                 logger.log_text(f"Tweet created and sent for {title}", severity="INFO")
-                logs_df.loc[len(logs_df)] = {"source": "fgv", "indicator": title, "posted": True}
-                update_logs_conn(logs_df)
+                ledger.append("fgv", title)
                 processed_count += 1
             except Exception as e:
                 logger.log_text(f"Failed to tweet data of indicator: {title} - {str(e)}", severity="ERROR")
@@ -1,12 +1,15 @@
 import pandas as pd
 from src.ibge.ibge import get_ibge_index
-from src.ibge.ibge_sched import run_crawler
-from src.ibge.gen_viz import wrangle, gen_chart
-from src.ibge.tweet import gen_text, create_tweet
-from utils.bucket_conn import update_logs_conn
+from src.ibge.sidra import get_batch
+from src.ibge.ibge_sched import run_crawler, RELEASE_TIME
+from utils.orchestrator import render_lock
+from utils.polling import poll, release_datetime, now_local, source_deadline
+from utils.sla_conn import SlaRecord
 
-def run_ibge(logger, logs_df):
+def run_ibge(logger, ledger):
     logger.log_text("Starting IBGE scheduler crawler", severity="INFO")
+    # Polling of every indicator shares the source budget
+    deadline = source_deadline("ibge")
 
     df = run_crawler(logger=logger)
 
@@ -16,27 +19,50 @@ def run_ibge(logger, logs_df):
 
     df = df.apply(lambda x: x.map(lambda y: y.isoformat() if isinstance(y, pd.Timestamp) else y))
 
+    # Rendering and posting dependencies are only imported when there is a release to process
+    from src.ibge.gen_viz import wrangle, gen_chart
+    from src.ibge.tweet import gen_text, create_tweet
+
+    # Once the release time has passed, tables due today are fetched in one concurrent batch and
+    # polling only refetches the ones not out yet; before it, polling waits for the release first
+    pending = {
+        row['name']: dict(indicador=row['title'], referencia=pd.to_datetime(row['referencia']), table=row['table'], v=row['v'], d=row['d'], name=row['name'])
+        for _, row in df.iterrows() if row['name'] not in ledger
+    }
+    now = now_local()
+    release_at = release_datetime(now.date(), RELEASE_TIME)
+    prefetched = get_batch(get_ibge_index, pending) if release_at is None or release_at <= now else {}
+
+    def fetch(name):
+        if name in prefetched:
+            result = prefetched.pop(name)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return get_ibge_index(**pending[name])
+
     processed_count = 0
     errors = []
     already_tweeted = []
 
     for index, row in df.iterrows():    
         name = row['name']
-        if name in logs_df['indicator'].values:  # Check if the indicator is already logged
+        if name in ledger:  # Check if the indicator is already logged
             logger.log_text(f"Indicator already tweeted: {name}", severity="INFO")
             already_tweeted.append(name)
             continue
 
-        title = row['title']
-        reference = pd.to_datetime(row['referencia'])
-        table = row['table']
-        v = row['v']
-        d = row['d']
         subtitle = row['subtitle']
+        release_at = release_datetime(now_local().date(), RELEASE_TIME)
         
         logger.log_text(f"Running IBGE crawler for {name}", severity="INFO")
+        sla = SlaRecord("ibge", name, release_at)
         try:
-            df_raw = get_ibge_index(title, reference, table, v, d, name)
+            df_raw = poll(lambda: fetch(name), release_at, logger=logger, name=name, deadline=deadline)
+            if df_raw is None:
+                logger.log_text(f"Data for {name} not updated on source yet", severity="WARNING")
+                continue
+            sla.mark("fetched")
             df_clean = wrangle(df_raw)
             
             if df_clean.empty:
@@ -44,13 +70,15 @@ def run_ibge(logger, logs_df):
                 continue
 
             twt_text = gen_text(df_clean, f"{name}")
-            chart = gen_chart(df_clean, name, subtitle)
-            create_tweet(twt_text, image_path=f"{name}", image_buffer=chart)
+            with render_lock:
+                chart = gen_chart(df_clean, name, subtitle)
+            sla.mark("rendered")
+            create_tweet(twt_text, image_path=f"{name}", image_buffer=chart, sla=sla)
             chart.close()
+            sla.save()
             
             logger.log_text(f"Tweet created and sent for {name}", severity="INFO")
-            logs_df.loc[len(logs_df)] = {"source": "ibge", "indicator": name, "posted": True}
-            update_logs_conn(logs_df)
+            ledger.append("ibge", name)
             processed_count += 1
         except Exception as e:
             logger.log_text(f"Failed to process data of indicator: {name} - {str(e)}", severity="ERROR")
@@ -1,13 +1,12 @@
-from src.abicom.ppi import PpiCrawler
-from src.abicom.gen_viz import gen_text, gen_graph
-from src.abicom.tweet import create_tweet
-from utils.bq_conn import get_data_from_bq_table, upsert_bq_table
-from utils.bucket_conn import update_logs_conn
+from src.abicom.ppi import PpiCrawler, complete_records
+from utils.http_conn import get_client
+from utils.orchestrator import render_lock
+from utils.sla_conn import SlaRecord
 from datetime import datetime, timedelta
 import pandas as pd
 import os
 
-def run_ppi(logger, logs_df):
+def run_ppi(logger, ledger):
     logger.log_text("Starting ABICOM PPI crawler", severity="INFO")
 
     PROJECT_ID = os.environ.get('PROJECT_ID')
@@ -17,7 +16,7 @@ def run_ppi(logger, logs_df):
     combs = ['diesel_pct', 'gasolina_pct']
     already_tweeted = []
     for comb in combs:
-        if comb in logs_df['indicator'].values:
+        if comb in ledger:
             logger.log_text(f"Indicator already tweeted: {comb}", severity="INFO")
             already_tweeted.append(comb)
             continue
@@ -28,14 +27,32 @@ def run_ppi(logger, logs_df):
     
     today = datetime.today().date()
     start_date = today - timedelta(5)
+    # ABICOM has no published release time, so the records start at the fetch
+    slas = {comb: SlaRecord("abicom", comb) for comb in combs}
+
     crawler = PpiCrawler(start_date)
-    data = crawler.run()
+    # Cheap probe first: nothing else runs until ABICOM has published today's page
+    if not crawler.check_date(get_client()):
+        logger.log_text("ABICOM PPI not published yet today.", severity="INFO")
+        return "No ABICOM PPI data to process"
+
+    from utils.bq_conn import get_data_from_bq_table, upsert_bq_table
+
+    # Dates already in BigQuery are not fetched again
+    df_raw = get_data_from_bq_table(project_id=PROJECT_ID, dataset_id=DATASET_ID, table_id=TABLE_ID, cached=True)
+    crawler.stored_dates = set() if df_raw.empty else set(df_raw.index.date)
+    data = crawler.run(check=False)
     
-    if data is None:
+    if not data:
         logger.log_text("ABICOM PPI crawler returned no data.", severity="WARNING")
         return "No ABICOM PPI data to process"
+    for sla in slas.values():
+        sla.mark("fetched")
+
+    # Rendering and posting dependencies are only imported when there is new data
+    from src.abicom.gen_viz import gen_text, gen_graph
+    from src.abicom.tweet import create_tweet
 
-    df_raw = get_data_from_bq_table(project_id=PROJECT_ID, dataset_id=DATASET_ID, table_id=TABLE_ID)
     df_new = pd.DataFrame(data)
     df_new.set_index('date', inplace=True)
     df_new.index = pd.to_datetime(df_new.index)
@@ -60,20 +77,23 @@ def run_ppi(logger, logs_df):
                 continue
 
             twt_txt = gen_text(df, comb)
-            chart = gen_graph(df, comb)
-            create_tweet(text=twt_txt, image_path=comb, image_buffer=chart)
+            with render_lock:
+                chart = gen_graph(df, comb)
+            slas[comb].mark("rendered")
+            create_tweet(text=twt_txt, image_path=comb, image_buffer=chart, sla=slas[comb])
             chart.close()
+            slas[comb].save()
 
             logger.log_text(f"Tweet created and sent for {comb}", severity="INFO")
-            logs_df.loc[len(logs_df)] = {"source": "abicom", "indicator": comb, "posted": True}
-            update_logs_conn(logs_df)
+            ledger.append("abicom", comb)
             processed_count += 1
         except Exception as e:
             logger.log_text(f"Failed to process data of indicator: {comb} - {str(e)}", severity="ERROR")
             errors.append(f"Failed to process data of indicator: {comb} - {str(e)}")
     
     if processed_count == 2:
-        upsert_bq_table(PROJECT_ID, DATASET_ID, TABLE_ID, data)
+        # Holidays and failed fetches are not written as NULL rows
+        upsert_bq_table(PROJECT_ID, DATASET_ID, TABLE_ID, complete_records(data))
 
     # Format the return value to handle multiple outcomes
     return (
@@ -1,29 +1,35 @@
 from src.ssp.ssp import wrangle_data
-from src.ssp.tweet import generate_tweet_text, create_tweet
-from src.ssp.gen_viz import gen_viz
-from utils.bucket_conn import update_logs_conn
+from utils.orchestrator import render_lock
+from utils.sla_conn import SlaRecord
 from datetime import datetime
 
 
-def run_ssp(logger, logs_df, month_logs_df):
+def run_ssp(logger, ledger, month_logs_df):
     logger.log_text("Starting SSP crawler", severity="INFO")
     name = 'roubos'
 
-    if name in month_logs_df['indicator'].values:
+    if name in month_logs_df['indicator'].values or name in ledger:
         logger.log_text(f"Indicator already tweeted: {name}", severity="INFO")
         return 'SSP crawler already tweeted!'
     
     today = datetime.today().date()
+    sla = SlaRecord("ssp", name)
     df = wrangle_data()
+    sla.mark("fetched")
     if df.index[-1].date().month == (today.month + 12 - 1)%12:
+        # Rendering and posting dependencies are only imported when there is new data
+        from src.ssp.tweet import generate_tweet_text, create_tweet
+        from src.ssp.gen_viz import gen_viz
         twt_txt = generate_tweet_text(df)
-        chart = gen_viz(df)
-        create_tweet(text=twt_txt, image_path=name, image_buffer=chart)
+        with render_lock:
+            chart = gen_viz(df)
+        sla.mark("rendered")
+        create_tweet(text=twt_txt, image_path=name, image_buffer=chart, sla=sla)
         chart.close()
+        sla.save()
 
         logger.log_text(f"Tweet created and sent for {name}", severity="INFO")
-        logs_df.loc[len(logs_df)] = {"source": "ssp", "indicator": name, "posted": True}
-        update_logs_conn(logs_df)
+        ledger.append("ssp", name)
         return 'SSP crawler tweeted sucessfully!'
     else:
         logger.log_text("SSP data nao atualizado na fonte", severity="INFO")
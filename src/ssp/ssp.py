@@ -1,13 +1,12 @@
 import pandas as pd
-import requests
-import seaborn as sns
-import matplotlib.pyplot as plt
 import json
-import matplotlib.dates as mdates
-from matplotlib.ticker import FuncFormatter, FixedLocator
 from datetime import datetime
-import matplotlib.lines as mlines
-import numpy as np
+from utils.http_conn import get
+from utils.ts_store import append_delta, delta_start
+
+FIRST_YEAR = 2022
+# Stored months this recent are requested again, so January still refreshes the previous year
+REVISION_WINDOW = pd.DateOffset(months=2)
 
 
 def get_data(ano: str, tipo: str, grupo: str):
@@ -26,7 +25,7 @@ def get_data(ano: str, tipo: str, grupo: str):
         'dezembro': 12
     }
     url_base = f'https://www.ssp.sp.gov.br/v1/OcorrenciasMensais/RecuperaDadosMensaisAgrupados?ano={ano}&grupoDelito=6&tipoGrupo={tipo}&idGrupo={grupo}'
-    response = requests.get(url_base)
+    response = get(url_base)
     json_raw = json.loads(response.content)['data'][0]['listaDados']
     df_raw = pd.DataFrame(json_raw)
     df = df_raw[['janeiro',
@@ -45,9 +44,21 @@ def get_data(ano: str, tipo: str, grupo: str):
     return df
 
 
+def get_stored_data(tipo: str, grupo: str):
+    """
+    Returns the monthly series of a group from FIRST_YEAR on, requesting only the years that are
+    not fully stored yet (plus the months inside REVISION_WINDOW) and upserting them into the
+    time-series store.
+    """
+    series = f"ssp/{tipo}-{grupo}"
+    start = delta_start(series, f"{FIRST_YEAR}-01-01", REVISION_WINDOW)
+    df = pd.concat([get_data(str(year), tipo, grupo) for year in range(start.year, int(datetime.today().date().year) + 1)], axis=0)
+    return append_delta(series, df).copy()
+
+
 def wrangle_data():
-    estado_df = pd.concat([get_data(str(year), 'ESTADO', '0') for year in range(2022, int(datetime.today().date().year) + 1)], axis=0)
-    capital_df = pd.concat([get_data(str(year), 'REGIÃO', '1') for year in range(2022, int(datetime.today().date().year) + 1)], axis=0)
+    estado_df = get_stored_data('ESTADO', '0')
+    capital_df = get_stored_data('REGIÃO', '1')
 
     merged_df = estado_df.merge(capital_df, on='date', suffixes=['_estado', '_capital'])
     merged_df.columns = [col.split('_')[-1] for col in merged_df.columns]
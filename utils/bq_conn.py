@@ -1,74 +1,187 @@
 from google.cloud import bigquery
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+import io
+import os
+from utils.storage_conn import get_storage
 
+# WAREHOUSE=sqlite swaps BigQuery for the local stand-in in utils.sqlite_conn
+WAREHOUSE = os.environ.get('WAREHOUSE', 'bigquery')
+CACHE_PREFIX = 'bq-cache'
+# Rows this close to the newest cached date are read again, since upserts may still revise them
+CACHE_OVERLAP = timedelta(days=float(os.environ.get('BQ_CACHE_OVERLAP_DAYS', 10)))
 
-def get_data_from_bq_table(project_id: str, dataset_id: str, table_id: str, query: str = None, sort_by_date: bool = True):
+# Warm instances keep the tables they already read
+_memory = {}
+
+
+def _read_query(client, query: str, params: list = None) -> pd.DataFrame:
+    job_config = bigquery.QueryJobConfig(query_parameters=params or [])
+    # Results are streamed as Arrow through the BigQuery Storage API (REST pages if it is unavailable)
+    df = client.query(query, job_config=job_config).to_arrow(create_bqstorage_client=True).to_pandas()
+    df['date'] = pd.to_datetime(df['date'])
+    df.set_index('date', drop=True, inplace=True)
+    return df
+
+
+def _window(start_date=None, end_date=None):
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append("date >= @start_date")
+        params.append(bigquery.ScalarQueryParameter("start_date", "DATE", pd.Timestamp(start_date).date()))
+    if end_date is not None:
+        conditions.append("date <= @end_date")
+        params.append(bigquery.ScalarQueryParameter("end_date", "DATE", pd.Timestamp(end_date).date()))
+    return (f" WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+
+def _read_cached(client, table: str, storage=None) -> pd.DataFrame:
+    """
+    Returns the whole table from a Parquet cache, querying only the rows newer than the cached
+    max date (minus CACHE_OVERLAP). The cache is stored as bq-cache/<table>.parquet in the 'tt-bot'
+    bucket (or under STORAGE_DIR), and only uploaded again when the query added or changed rows.
+    """
+    key = f"{CACHE_PREFIX}/{table}.parquet"
+    storage = storage or get_storage()
+    cached = _memory.get(key)
+    if cached is None:
+        try:
+            raw = storage.read_bytes(key)
+            cached = pd.read_parquet(io.BytesIO(raw)) if raw else None
+        except Exception as e:
+            print(f"An error occurred while reading the cache {key}: {e}")
+
+    if cached is None or cached.empty:
+        df = _read_query(client, f"SELECT * FROM `{table}` ORDER BY date ASC")
+        changed = True
+    else:
+        since = (cached.index.max() - CACHE_OVERLAP).normalize()
+        delta = _read_query(
+            client,
+            f"SELECT * FROM `{table}` WHERE date > @since ORDER BY date ASC",
+            [bigquery.ScalarQueryParameter("since", "DATE", since.date())],
+        )
+        df = pd.concat([cached[cached.index <= since], delta]).sort_index()
+        changed = not cached[cached.index > since].sort_index().equals(delta.sort_index())
+        print(f"Read {len(delta)} rows of {table} newer than {since.date()}, {len(cached)} rows cached")
+
+    _memory[key] = df
+    if not changed:
+        return df
+    try:
+        buffer = io.BytesIO()
+        df.to_parquet(buffer)
+        storage.write_bytes(key, buffer.getvalue(), content_type='application/vnd.apache.parquet')
+    except Exception as e:
+        print(f"An error occurred while writing the cache {key}: {e}")
+    return df
+
+
+def get_data_from_bq_table(project_id: str, dataset_id: str, table_id: str, query: str = None, sort_by_date: bool = True,
+                           start_date=None, end_date=None, cached: bool = False, storage=None):
     """
     Retrieve data from a BigQuery table. If a query is provided, it will be used to fetch data.
-    Otherwise, all data from the table will be returned.
+    Otherwise, all data from the table will be returned, optionally limited to a date window.
 
     :param project_id: The ID of the project where the dataset resides.
     :param dataset_id: The ID of the dataset containing the table.
     :param table_id: The ID of the table to query.
     :param query: Optional SQL query string. If None, all data from the table is fetched.
-    :return: List of dictionaries representing rows from the table.
+    :param start_date: Optional first date of the window (inclusive).
+    :param end_date: Optional last date of the window (inclusive).
+    :param cached: Read through the Parquet cache, querying only the rows added since the last read.
+    :param storage: Optional storage backend for the cache, defaults to utils.storage_conn.get_storage().
+    :return: DataFrame indexed by date.
     """
+    if WAREHOUSE == 'sqlite':
+        from utils.sqlite_conn import get_data_from_sqlite_table
+        return get_data_from_sqlite_table(project_id, dataset_id, table_id, query, sort_by_date, start_date, end_date)
+
     client = bigquery.Client(project=project_id)
-    if query is None:
-        base_query = f"SELECT * FROM `{project_id}.{dataset_id}.{table_id}`"
-        query = base_query + " ORDER BY date ASC" if sort_by_date else base_query
+    table = f"{project_id}.{dataset_id}.{table_id}"
     
     try:
-        # Execute the query
-        query_job = client.query(query)
-        # Convert the result directly to a DataFrame
-        df = query_job.to_dataframe()
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', drop=True, inplace=True)
-        df.dropna(inplace=True, how='any')
-        return df
+        if query is not None:
+            df = _read_query(client, query)
+        elif cached:
+            df = _read_cached(client, table, storage)
+            df = df.loc[(df.index >= pd.Timestamp(start_date or df.index.min())) & (df.index <= pd.Timestamp(end_date or df.index.max()))]
+        else:
+            where, params = _window(start_date, end_date)
+            base_query = f"SELECT * FROM `{table}`{where}"
+            query = base_query + " ORDER BY date ASC" if sort_by_date else base_query
+            df = _read_query(client, query, params)
+        return df.dropna(how='any')
     except Exception as e:
         print(f"An error occurred: {e}")
         return pd.DataFrame()
 
-def upsert_bq_table(project_id: str, dataset_id: str, table_id: str, data: list[dict]):
+def _struct_param(schema: list, row: dict):
+    values = [None if pd.isna(row.get(field.name)) else row.get(field.name) for field in schema]
+    return bigquery.StructQueryParameter(
+        None,
+        *[bigquery.ScalarQueryParameter(field.name, field.field_type, value) for field, value in zip(schema, values)],
+    )
+
+def upsert_bq_table(project_id: str, dataset_id: str, table_id: str, data: list[dict], key: str = 'date'):
+    """
+    Inserts or updates rows of a BigQuery table with a single MERGE job.
+
+    All rows are sent as one array-of-structs query parameter, so the cost is one job whatever
+    the number of rows. The columns come from the table schema: every column present in the
+    rows is merged, matching on the key column. When a key appears more than once, the last
+    row wins.
+
+    :param project_id: The ID of the project where the dataset resides.
+    :param dataset_id: The ID of the dataset containing the table.
+    :param table_id: The ID of the table to upsert into.
+    :param data: List of dictionaries, one per row.
+    :param key: Column used to match existing rows.
+    :return: None
+    """
+    if not data:
+        return
+    if WAREHOUSE == 'sqlite':
+        from utils.sqlite_conn import upsert_sqlite_table
+        return upsert_sqlite_table(project_id, dataset_id, table_id, data, key)
+
     client = bigquery.Client()
     
-    table_id = f"{project_id}.{dataset_id}.{table_id}"  # Replace with your actual table identifier
-    
-    for row in data:
-        try:
-            query = f"""
-            MERGE `{table_id}` T
-            USING (SELECT @date AS date, @diesel_pct AS diesel_pct, @diesel_brl AS diesel_brl, 
-                          @gasolina_pct AS gasolina_pct, @gasolina_brl AS gasolina_brl) S
-            ON T.date = S.date
-            WHEN MATCHED THEN
-              UPDATE SET
-                diesel_pct = S.diesel_pct,
-                diesel_brl = S.diesel_brl,
-                gasolina_pct = S.gasolina_pct,
-                gasolina_brl = S.gasolina_brl
-            WHEN NOT MATCHED THEN
-              INSERT (date, diesel_pct, diesel_brl, gasolina_pct, gasolina_brl)
-              VALUES (S.date, S.diesel_pct, S.diesel_brl, S.gasolina_pct, S.gasolina_brl)
-            """
-            
-            job_config = bigquery.QueryJobConfig(
-                query_parameters=[
-                    bigquery.ScalarQueryParameter("date", "DATE", row['date']),
-                    bigquery.ScalarQueryParameter("diesel_pct", "FLOAT", row['diesel_pct']),
-                    bigquery.ScalarQueryParameter("diesel_brl", "FLOAT", row['diesel_brl']),
-                    bigquery.ScalarQueryParameter("gasolina_pct", "FLOAT", row['gasolina_pct']),
-                    bigquery.ScalarQueryParameter("gasolina_brl", "FLOAT", row['gasolina_brl']),
-                ]
-            )
-            
-            query_job = client.query(query, job_config=job_config)
-            query_job.result()  # Wait for the job to complete and get results
-            
-            print(f"Successfully processed data for date: {row['date']}")
+    table_id = f"{project_id}.{dataset_id}.{table_id}"
+    rows = list({row[key]: row for row in data}.values())
 
-        except Exception as e:
-            print(f"An error occurred while processing data for date {row['date']}: {str(e)}")
+    try:
+        table_schema = client.get_table(table_id).schema
+        unknown = sorted({column for row in rows for column in row} - {field.name for field in table_schema})
+        if unknown:
+            print(f"Warning: columns not in the schema of {table_id} are not upserted: {', '.join(unknown)}")
+        schema = [field for field in table_schema if any(field.name in row for row in rows)]
+        columns = [field.name for field in schema]
+        updates = ", ".join(f"{column} = S.{column}" for column in columns if column != key)
+        # Rows carrying only the key have nothing to update, existing keys are left as they are
+        matched = f"""
+        WHEN MATCHED THEN
+          UPDATE SET {updates}""" if updates else ""
+
+        query = f"""
+        MERGE `{table_id}` T
+        USING UNNEST(@rows) S
+        ON T.{key} = S.{key}{matched}
+        WHEN NOT MATCHED THEN
+          INSERT ({", ".join(columns)})
+          VALUES ({", ".join(f"S.{column}" for column in columns)})
+        """
+
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("rows", "STRUCT", [_struct_param(schema, row) for row in rows]),
+            ]
+        )
+
+        query_job = client.query(query, job_config=job_config)
+        query_job.result()  # Wait for the job to complete
+
+        print(f"Successfully processed data for {len(rows)} dates: {', '.join(str(row[key]) for row in rows)}")
+
+    except Exception as e:
+        print(f"An error occurred while upserting {len(rows)} rows into {table_id}: {str(e)}")
@@ -1,88 +1,218 @@
-from google.cloud import storage
 import pandas as pd
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import io
+from utils.storage_conn import get_storage, GenerationMismatch
+from utils.polling import today_local
 
-def logs_conn():
-    today = datetime.today().date()
-    client = storage.Client()
+LEDGER_PREFIX = 'tweeted-logs/ledger'
+LOG_COLUMNS = ["source", "indicator", "posted"]
+MONTH_COLUMNS = LOG_COLUMNS + ["date"]
+MONTH_SNAPSHOT = '_month.csv'
+MONTH_WORKERS = 8
+SNAPSHOT_ATTEMPTS = 3
 
-    bucket_name = 'tt-bot'
-    file_name = f'tweeted-logs/{today.strftime("%Y-%m")}/{today}.csv'
+def _daily_path(day):
+    return f'tweeted-logs/{day.strftime("%Y-%m")}/{day}.csv'
 
-    bucket = client.get_bucket(bucket_name)
-    blob = bucket.blob(file_name)
-    
+def _read_csv(data):
+    return pd.read_csv(io.BytesIO(data))
+
+def _to_csv(df):
+    return df.to_csv(index=False).encode('utf-8')
+
+def _month_prefix(day):
+    return f'tweeted-logs/{day.strftime("%Y-%m")}/'
+
+
+def _read_daily_logs(storage, path):
     try:
-        csv_content = blob.download_as_text()
-        df = pd.read_csv(io.StringIO(csv_content))
+        df = _read_csv(storage.read_bytes(path))
+        df['date'] = path.rsplit('/', 1)[-1].removesuffix('.csv')
+        return df
     except Exception as e:
         print(f"File does not exist or an error occurred: {e}")
-        df = pd.DataFrame(columns=["source", "indicator", "posted"])
-        
-        # Create the intermediate directory if it does not exist
-        intermediate_dir = f'tweeted-logs/{today.strftime("%Y-%m")}/'
-        bucket.blob(intermediate_dir).upload_from_string('', content_type='application/x-directory')
-        
-        blob.upload_from_string(df.to_csv(index=False), content_type='text/csv')
-        print(f"Created new CSV file: {file_name}")
+        return None
 
-    return df
 
-def logs_conn_monthly():
-    today = datetime.today().date()
-    client = storage.Client()
+def _build_month_logs(storage, day):
+    """Downloads every daily CSV of the month in parallel and concatenates them once."""
+    prefix = _month_prefix(day)
+    paths = [
+        path for path in storage.list(prefix)
+        if path.endswith('.csv') and path != f'{prefix}{MONTH_SNAPSHOT}'
+    ]
+    with ThreadPoolExecutor(max_workers=MONTH_WORKERS) as executor:
+        frames = [df for df in executor.map(lambda path: _read_daily_logs(storage, path), paths) if df is not None]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=MONTH_COLUMNS)
 
-    bucket_name = 'tt-bot'
-    bucket = client.get_bucket(bucket_name)
 
-    # Initialize an empty DataFrame
-    df_monthly = pd.DataFrame(columns=["source", "indicator", "posted"])
+def update_month_snapshot(rows, day, storage=None):
+    """
+    Merges newly posted rows into the month snapshot (tweeted-logs/<YYYY-MM>/_month.csv).
 
-    # Get the prefix for the current month
-    prefix = f'tweeted-logs/{today.strftime("%Y-%m")}/'
+    The snapshot is replaced with a generation precondition and the merge is retried when
+    another run updated it in between.
 
-    # Create the intermediate directory if it does not exist
-    intermediate_dir = prefix
-    bucket.blob(intermediate_dir).upload_from_string('', content_type='application/x-directory')
+    :param rows: List of dicts with 'source', 'indicator' and 'posted'
+    :param day: Day the rows were posted
+    :param storage: Optional storage backend
+    :return: True when the snapshot holds the rows (or does not exist yet), False when it kept changing
+    """
+    storage = storage or get_storage()
+    path = f'{_month_prefix(day)}{MONTH_SNAPSHOT}'
+    new = pd.DataFrame(rows, columns=LOG_COLUMNS).assign(date=str(day))
+    for _ in range(SNAPSHOT_ATTEMPTS):
+        try:
+            data, generation = storage.read_versioned(path)
+        except GenerationMismatch:
+            continue
+        if data is None:
+            # Without a snapshot the next monthly read builds it from the daily files
+            return True
+        df = pd.concat([_read_csv(data), new], ignore_index=True).drop_duplicates(subset=['date', 'indicator'])
+        try:
+            storage.write_bytes(path, _to_csv(df), content_type='text/csv', if_generation_match=generation)
+            return True
+        except GenerationMismatch:
+            continue
+    print(f"An error occurred while updating the month snapshot: {path} kept changing")
+    return False
 
-    # Get a list of blobs in the bucket with the prefix
-    blobs = list(bucket.list_blobs(prefix=prefix))
 
-    # Loop through each blob
-    for blob in blobs:
-        try:
-            csv_content = blob.download_as_text()
-            df = pd.read_csv(io.StringIO(csv_content))
-            df_monthly = pd.concat([df_monthly, df], ignore_index=True)
-        except Exception as e:
-            print(f"File does not exist or an error occurred: {e}")
+def logs_conn_monthly(storage=None):
+    """
+    Returns the tweeted logs of the current month.
+
+    Reads the month snapshot, a single object kept up to date by the ledger compaction. When
+    it does not exist yet, it is built from the daily CSVs (downloaded in parallel) and stored.
+
+    :return: pandas DataFrame with 'source', 'indicator', 'posted' and 'date' columns
+    """
+    today = today_local()
+    storage = storage or get_storage()
+    path = f'{_month_prefix(today)}{MONTH_SNAPSHOT}'
+
+    try:
+        data = storage.read_bytes(path)
+        if data is not None:
+            return _read_csv(data)
+    except Exception as e:
+        print(f"An error occurred while reading the month snapshot: {e}")
+        return _build_month_logs(storage, today)
+
+    df_monthly = _build_month_logs(storage, today)
+    try:
+        storage.write_bytes(path, _to_csv(df_monthly), content_type='text/csv', if_generation_match=0)
+        print(f"Created month snapshot: {path}")
+    except GenerationMismatch:
+        pass
+    except Exception as e:
+        print(f"An error occurred while creating the month snapshot: {e}")
 
     return df_monthly
 
-def update_logs_conn(df):
+class TweetLedger:
     """
-    Updates the CSV file in Google Cloud Storage with the provided DataFrame.
+    Append-only record of the indicators tweeted on a day.
 
-    :param df: pandas DataFrame to upload to GCS
-    :return: None
+    Each post is written as its own one-row CSV under tweeted-logs/ledger/<YYYY-MM-DD>/ with a
+    create-only precondition, so a post costs one small upload and overlapping runs never
+    overwrite each other's rows. compact() folds those entries into the daily CSV
+    (tweeted-logs/<YYYY-MM>/<YYYY-MM-DD>.csv) and removes them. "Already tweeted" checks are
+    answered from an in-memory set: `indicator in ledger`.
     """
-    today = datetime.today().date()
-    client = storage.Client()
 
-    bucket_name = 'tt-bot'
-    file_name = f'tweeted-logs/{today.strftime("%Y-%m")}/{today}.csv'
+    def __init__(self, day=None, storage=None):
+        self.day = day or today_local()
+        self.storage = storage or get_storage()
+        self.daily_path = _daily_path(self.day)
+        self.prefix = f'{LEDGER_PREFIX}/{self.day}/'
+        self._lock = threading.Lock()
+        self._posted = set()
+        self.rows = []
+
+        for row in self._read_daily()[0] + list(self._read_entries().values()):
+            self._add(row)
+
+    def __contains__(self, indicator):
+        return indicator in self._posted
+
+    @property
+    def df(self):
+        with self._lock:
+            return pd.DataFrame(self.rows, columns=LOG_COLUMNS)
+
+    def _add(self, row):
+        if row['indicator'] not in self._posted:
+            self._posted.add(row['indicator'])
+            self.rows.append(row)
+
+    def _read_daily(self):
+        data, generation = self.storage.read_versioned(self.daily_path)
+        return (_read_csv(data).to_dict('records') if data else []), generation
+
+    def _read_entries(self):
+        entries = {}
+        for path, data in self.storage.read_prefix(self.prefix).items():
+            try:
+                entries[path] = _read_csv(data).to_dict('records')[0]
+            except Exception as e:
+                print(f"An error occurred while reading the ledger entry {path}: {e}")
+        return entries
+
+    def append(self, source, indicator):
+        """
+        Records a posted indicator.
+
+        :param source: Name of the data source (e.g. 'bcb')
+        :param indicator: Name of the posted indicator
+        :return: None
+        """
+        row = {"source": source, "indicator": indicator, "posted": True}
+        with self._lock:
+            self._add(row)
+        name = f'{self.prefix}{source}__{str(indicator).replace("/", "-")}.csv'
+        try:
+            self.storage.write_bytes(name, _to_csv(pd.DataFrame([row], columns=LOG_COLUMNS)), content_type='text/csv', if_generation_match=0)
+        except GenerationMismatch:
+            print(f"Ledger entry already recorded: {name}")
+        except Exception as e:
+            print(f"An error occurred while appending the ledger entry {name}: {e}")
 
-    bucket = client.get_bucket(bucket_name)
-    blob = bucket.blob(file_name)
+    def compact(self):
+        """
+        Merges the ledger entries into the daily CSV and deletes them.
 
-    # Convert DataFrame to CSV string
-    csv_data = df.to_csv(index=False)
+        The daily CSV is only replaced if it did not change since it was read, so a concurrent
+        compaction makes this one give up instead of dropping rows; its entries stay in the
+        ledger for the next run.
 
-    try:
-        # Upload the DataFrame as a CSV file to GCS
-        blob.upload_from_string(csv_data, content_type='text/csv')
-        print(f"Updated tt_logs CSV file: {file_name}")
+        :return: Number of entries compacted
+        """
+        entries = self._read_entries()
+        if not entries:
+            return 0
 
-    except Exception as e:
-        print(f"An error occurred while updating the tt logs CSV file: {e}")
+        rows, generation = self._read_daily()
+        seen = {row['indicator'] for row in rows}
+        for row in entries.values():
+            if row['indicator'] not in seen:
+                seen.add(row['indicator'])
+                rows.append(row)
+
+        try:
+            self.storage.write_bytes(self.daily_path, _to_csv(pd.DataFrame(rows, columns=LOG_COLUMNS)), content_type='text/csv', if_generation_match=generation)
+        except GenerationMismatch:
+            print(f"Daily log changed during compaction, keeping ledger entries: {self.daily_path}")
+            return 0
+
+        if not update_month_snapshot(list(entries.values()), self.day, self.storage):
+            # The daily CSV has the rows, so the next monthly read rebuilds a complete snapshot from it
+            self.storage.delete(f'{_month_prefix(self.day)}{MONTH_SNAPSHOT}')
+            print(f"Month snapshot of {self.day:%Y-%m} invalidated, it will be rebuilt from the daily logs")
+
+        for name in entries:
+            self.storage.delete(name)
+        print(f"Compacted {len(entries)} ledger entries into {self.daily_path}")
+        return len(entries)
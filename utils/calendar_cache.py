@@ -0,0 +1,106 @@
+import io
+import json
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+from utils.http_conn import get
+from utils.storage_conn import get_storage
+
+CACHE_PREFIX = 'calendar-cache'
+DEFAULT_TTL = timedelta(hours=float(os.environ.get('CALENDAR_CACHE_TTL_HOURS', 12)))
+
+# Warm instances keep the entries they already read or built
+_memory = {}
+
+
+def _read_entry(storage, key, logger):
+    if key in _memory:
+        return _memory[key]
+    try:
+        raw = storage.read_bytes(key)
+        return json.loads(raw) if raw else None
+    except Exception as e:
+        if logger:
+            logger.log_text(f"Failed to read calendar cache {key}: {str(e)}", severity="WARNING")
+        return None
+
+
+def _write_entry(storage, key, entry, logger):
+    _memory[key] = entry
+    try:
+        storage.write_bytes(key, json.dumps(entry).encode('utf-8'), content_type='application/json')
+    except Exception as e:
+        if logger:
+            logger.log_text(f"Failed to write calendar cache {key}: {str(e)}", severity="WARNING")
+
+
+def _to_entry(df, fetched_at, validators) -> dict:
+    # The index goes in as a column, since calendars usually have several events on the same date
+    calendar = df.reset_index().to_json(orient='table', index=False, date_format='iso')
+    return {'fetched_at': fetched_at, **validators, 'index': df.index.name, 'calendar': calendar}
+
+
+def _to_frame(entry) -> pd.DataFrame:
+    df = pd.read_json(io.StringIO(entry['calendar']), orient='table')
+    return df.set_index(entry['index'], drop=True)
+
+
+def get_calendar(source: str, build, url: str = None, ttl: timedelta = DEFAULT_TTL, logger=None, storage=None) -> pd.DataFrame:
+    """
+    Returns the parsed release calendar of a source for the current month, from the cache when possible.
+
+    Entries are stored as calendar-cache/<source>/<YYYY-MM>.json in the 'tt-bot' bucket (or under
+    STORAGE_DIR) and hold the parsed calendar plus the HTTP validators of the page it came from.
+    An entry younger than ttl is used as is. An older one is revalidated with a conditional request
+    (If-None-Match / If-Modified-Since) when a url is given, and rebuilt otherwise. Frames with
+    df.attrs['partial'] set are returned but not cached.
+
+    :param source: Name of the calendar (e.g. 'fgv', 'ibge', 'bcb-mes').
+    :param build: Callable that returns the full calendar DataFrame. It receives the page text when
+                  url is given, and no arguments otherwise.
+    :param url: Optional URL of the calendar page, enables conditional requests.
+    :param ttl: Maximum age of an entry before it is revalidated.
+    :param logger: Optional logger with a log_text(text, severity) method.
+    :param storage: Optional storage backend, defaults to utils.storage_conn.get_storage().
+    :return: The full (unfiltered) calendar DataFrame.
+    """
+    now = datetime.now()
+    key = f"{CACHE_PREFIX}/{source}/{now.strftime('%Y-%m')}.json"
+    try:
+        storage = storage or get_storage()
+    except Exception as e:
+        if logger:
+            logger.log_text(f"Calendar cache unavailable, building {source} calendar: {str(e)}", severity="WARNING")
+        return build(get(url).raise_for_status().text) if url else build()
+
+    entry = _read_entry(storage, key, logger)
+    if entry and now - datetime.fromisoformat(entry['fetched_at']) < ttl:
+        if logger:
+            logger.log_text(f"Using cached {source} calendar", severity="DEBUG")
+        return _to_frame(entry)
+
+    validators = {}
+    if url is None:
+        df = build()
+    else:
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        response = get(url, headers=headers)
+        if response.status_code == 304 and entry:
+            if logger:
+                logger.log_text(f"{source} calendar not modified, refreshing cache entry", severity="DEBUG")
+            entry['fetched_at'] = now.isoformat()
+            _write_entry(storage, key, entry, logger)
+            return _to_frame(entry)
+        response.raise_for_status()
+        validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+        df = build(response.text)
+
+    # Calendars built from an incomplete set of requests are flagged by the builder and never cached
+    if isinstance(df, pd.DataFrame) and not df.empty and not df.attrs.get('partial'):
+        entry = _to_entry(df, now.isoformat(), validators)
+        _write_entry(storage, key, entry, logger)
+    return df
@@ -0,0 +1,178 @@
+import threading
+import time
+import httpx
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/json,application/xhtml+xml,*/*",
+}
+DEFAULT_TIMEOUT = httpx.Timeout(connect=5.0, read=20.0, write=10.0, pool=10.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=40, max_keepalive_connections=20, keepalive_expiry=60.0)
+
+# Maximum number of in-flight requests per host, so parallel crawls do not hammer a single portal
+HOST_LIMITS = {
+    "www.bcb.gov.br": 8,
+    "api.bcb.gov.br": 6,
+    "apisidra.ibge.gov.br": 4,
+    "extra-ibre.fgv.br": 2,
+    "abicom.com.br": 4,
+}
+DEFAULT_HOST_LIMIT = 4
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError)
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that gives the host slot back once the body is read and closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class PooledTransport(httpx.BaseTransport):
+    """
+    Keep-alive / HTTP/2 connection pool shared by every client in the process.
+
+    On top of the httpx pool it limits the number of concurrent requests per host and
+    retries idempotent requests on connection errors, read timeouts and 429/5xx answers,
+    with exponential backoff (honouring Retry-After when it is given in seconds).
+    Closing a client built on this transport does not close the shared pool.
+    """
+
+    def __init__(self, retries: int = 2, backoff: float = 0.5, max_backoff: float = 8.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._transport = httpx.HTTPTransport(http2=True, limits=DEFAULT_LIMITS)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT))
+            return self._semaphores[host]
+
+    def _wait(self, attempt: int, response: httpx.Response = None):
+        delay = self.backoff * 2 ** attempt
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        time.sleep(min(delay, self.max_backoff))
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        retries = self.retries if request.method in RETRY_METHODS else 0
+        semaphore = self._host_semaphore(request.url.host)
+        for attempt in range(retries + 1):
+            semaphore.acquire()
+            try:
+                response = self._transport.handle_request(request)
+            except RETRY_EXCEPTIONS:
+                semaphore.release()
+                if attempt == retries:
+                    raise
+                self._wait(attempt)
+                continue
+            except BaseException:
+                semaphore.release()
+                raise
+
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                response.close()
+                semaphore.release()
+                self._wait(attempt, response)
+                continue
+
+            released = threading.Event()
+
+            def release():
+                if not released.is_set():
+                    released.set()
+                    semaphore.release()
+
+            return httpx.Response(
+                status_code=response.status_code,
+                headers=response.headers,
+                stream=_ReleasingStream(response.stream, release),
+                extensions=response.extensions,
+            )
+
+    def close(self):
+        # The pool is shared by every client in the process, see close_all()
+        pass
+
+
+_transport = None
+_client = None
+_lock = threading.Lock()
+
+
+def get_transport() -> PooledTransport:
+    global _transport
+    with _lock:
+        if _transport is None:
+            _transport = PooledTransport()
+        return _transport
+
+
+def new_session(**kwargs) -> httpx.Client:
+    """
+    Creates a client with its own cookie jar on top of the shared connection pool.
+
+    Use it for authenticated sessions (e.g. the FGV portal) that must not share cookies
+    with the other crawlers. Keyword arguments override the default client settings.
+
+    :return: httpx.Client using the shared PooledTransport.
+    """
+    settings = {
+        "follow_redirects": True,
+        "timeout": DEFAULT_TIMEOUT,
+        "headers": DEFAULT_HEADERS,
+    } | kwargs
+    return httpx.Client(transport=get_transport(), **settings)
+
+
+def get_client() -> httpx.Client:
+    """
+    Returns the process-wide client used for anonymous requests. It is thread-safe and
+    reused across warm invocations, so do not close it.
+
+    :return: httpx.Client using the shared PooledTransport.
+    """
+    global _client
+    if _client is None:
+        client = new_session()
+        with _lock:
+            if _client is None:
+                _client = client
+    return _client
+
+
+def get(url: str, **kwargs) -> httpx.Response:
+    return get_client().get(url, **kwargs)
+
+
+def head(url: str, **kwargs) -> httpx.Response:
+    return get_client().head(url, **kwargs)
+
+
+def close_all():
+    """Closes the shared client and connection pool (e.g. at the end of a local script)."""
+    global _client, _transport
+    with _lock:
+        if _transport is not None:
+            _transport._transport.close()
+        _client = None
+        _transport = None
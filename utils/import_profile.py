@@ -0,0 +1,70 @@
+import argparse
+import subprocess
+import sys
+
+
+def profile_imports(module: str = "main") -> list[dict]:
+    """
+    Imports a module in a fresh interpreter with -X importtime and parses the report.
+
+    :param module: Dotted name of the module to import (defaults to the Cloud Function entry point).
+    :return: List of dictionaries with 'module', 'self_us' and 'cumulative_us' for every import.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else f"Failed to import {module}")
+    return rows
+
+
+def cold_start_report(module: str = "main", top: int = 20, prefix: str = None) -> str:
+    """
+    Builds a text report with the cold start cost per top-level package and per module.
+
+    :param module: Dotted name of the module to profile.
+    :param top: Number of modules listed in the per-module section.
+    :param prefix: Optional module prefix to restrict the per-module section (e.g. 'src.').
+    :return: The formatted report.
+    """
+    rows = profile_imports(module)
+    if not rows:
+        return f"No import data collected for {module}"
+
+    # Self times added per top-level package (e.g. 'matplotlib', 'google', 'src')
+    packages = {}
+    for row in rows:
+        package = row["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + row["self_us"]
+    total_us = sum(packages.values())
+
+    lines = [f"Import-time profile for '{module}': {total_us / 1000:.1f} ms total", "", "Per package (self time):"]
+    for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f"  {package:<40} {us / 1000:>9.1f} ms  {us / total_us:>6.1%}")
+
+    modules = [row for row in rows if prefix is None or row["module"].startswith(prefix)]
+    lines += ["", "Per module (cumulative time):"]
+    for row in sorted(modules, key=lambda item: item["cumulative_us"], reverse=True)[:top]:
+        lines.append(f"  {row['module']:<40} {row['cumulative_us'] / 1000:>9.1f} ms")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the import-time cost of the cold start.")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--prefix", default=None, help="Only list modules starting with this prefix, e.g. 'src.'")
+    args = parser.parse_args()
+    print(cold_start_report(args.module, args.top, args.prefix))
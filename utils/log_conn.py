@@ -0,0 +1,135 @@
+import os
+import queue
+import threading
+import time
+
+SEVERITY_LEVELS = {
+    "DEFAULT": 0,
+    "DEBUG": 100,
+    "INFO": 200,
+    "NOTICE": 300,
+    "WARNING": 400,
+    "ERROR": 500,
+    "CRITICAL": 600,
+    "ALERT": 700,
+    "EMERGENCY": 800,
+}
+# Longest wait for pending log writes at the end of an invocation, so a stalled Cloud Logging
+# cannot push the function past its timeout
+FLUSH_TIMEOUT = float(os.environ.get('LOG_FLUSH_SECONDS', 5))
+
+
+class BatchedLogger:
+    """
+    Drop-in replacement for a Cloud Logging logger that keeps log writes off the hot path.
+
+    Entries below the minimum severity are discarded before any network I/O. The rest are
+    buffered in memory and written in batches by a background thread, either when the
+    batch is full or every flush_interval seconds. flush() blocks until the buffer is written,
+    for at most FLUSH_TIMEOUT seconds.
+    The Cloud Logging client is only imported and built by the background thread, on the
+    first write, so creating a logger costs nothing at import time.
+    """
+
+    def __init__(self, name: str, min_severity: str = None, batch_size: int = 50, flush_interval: float = 2.0):
+        self.name = name
+        self.min_level = SEVERITY_LEVELS.get((min_severity or os.environ.get("LOG_LEVEL", "INFO")).upper(), 200)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._flushing = threading.Event()
+        self._logger = None
+        self._worker = threading.Thread(target=self._run, name=f"log-{name}", daemon=True)
+        self._worker.start()
+
+    def log_text(self, text: str, severity: str = "DEFAULT"):
+        if SEVERITY_LEVELS.get(severity.upper(), 0) < self.min_level:
+            return
+        self._queue.put((text, severity))
+
+    def flush(self, timeout: float = None):
+        """
+        Blocks until every entry logged so far has been written to Cloud Logging, or the timeout passes.
+
+        :param timeout: Seconds to wait, defaults to FLUSH_TIMEOUT. Entries still queued then are dropped.
+        :return: True when everything was written.
+        """
+        deadline = time.monotonic() + (FLUSH_TIMEOUT if timeout is None else timeout)
+        self._flushing.set()
+        try:
+            while self._queue.unfinished_tasks and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            self._flushing.clear()
+        if not self._queue.unfinished_tasks:
+            return True
+        dropped = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            dropped += 1
+        print(f"Warning: log flush of {self.name} timed out, dropped {dropped} queued entries")
+        return False
+
+    def _run(self):
+        while True:
+            entries = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # Keep filling the batch until it is full, the interval expires or a flush is requested
+            while len(entries) < self.batch_size and not self._flushing.is_set():
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    entries.append(self._queue.get(timeout=min(timeout, 0.1)))
+                except queue.Empty:
+                    pass
+            self._write(entries)
+
+    def _write(self, entries):
+        try:
+            if self._logger is None:
+                from google.cloud import logging as gcp_logging
+                self._logger = gcp_logging.Client().logger(self.name)
+            batch = self._logger.batch()
+            for text, severity in entries:
+                batch.log_text(text, severity=severity)
+            batch.commit()
+        except Exception as e:
+            print(f"An error occurred while writing {len(entries)} log entries: {e}")
+        finally:
+            for _ in entries:
+                self._queue.task_done()
+
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+
+def get_logger(name: str) -> BatchedLogger:
+    """
+    Returns the process-wide BatchedLogger for the given log name, creating it on first use.
+
+    :param name: Cloud Logging log name (e.g. 'main_run').
+    :return: BatchedLogger instance.
+    """
+    with _loggers_lock:
+        if name not in _loggers:
+            _loggers[name] = BatchedLogger(name)
+        return _loggers[name]
+
+
+def flush_all(timeout: float = None):
+    """
+    Flushes every logger created through get_logger. Call it before the function returns.
+
+    :param timeout: Seconds shared by all the loggers, defaults to FLUSH_TIMEOUT.
+    """
+    deadline = time.monotonic() + (FLUSH_TIMEOUT if timeout is None else timeout)
+    with _loggers_lock:
+        loggers = list(_loggers.values())
+    for logger in loggers:
+        logger.flush(max(0.0, deadline - time.monotonic()))
@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# pyplot keeps global figure state, so charts from different sources must not be drawn at the same time
+render_lock = threading.Lock()
+
+DEFAULT_BUDGET = 50.0
+
+
+def get_budgets(sources: list[str]) -> dict:
+    """
+    Reads the per-source time budgets (in seconds) from the environment.
+
+    Each source can be tuned with BUDGET_<SOURCE> (e.g. BUDGET_FGV=45), falling back
+    to SOURCE_BUDGET and then to DEFAULT_BUDGET.
+
+    :param sources: Names of the sources that will be run.
+    :return: Dictionary mapping each source to its budget in seconds.
+    """
+    default = float(os.environ.get('SOURCE_BUDGET', DEFAULT_BUDGET))
+    return {source: float(os.environ.get(f'BUDGET_{source.upper()}', default)) for source in sources}
+
+
+def run_concurrently(tasks: dict, budgets: dict, logger=None) -> dict:
+    """
+    Runs each source pipeline in its own worker thread with a separate deadline.
+
+    All deadlines are counted from the moment the tasks are submitted, so the total
+    wall-clock time is bounded by the largest budget. Sources that go over budget are
+    cancelled if they have not started yet, or abandoned otherwise (Python threads
+    cannot be killed); their summary reports the timeout.
+
+    :param tasks: Dictionary mapping the source name to a zero-argument callable.
+    :param budgets: Dictionary mapping the source name to its budget in seconds.
+    :param logger: Optional logger with a log_text(text, severity) method.
+    :return: Dictionary mapping the source name to its result (or an error summary).
+    """
+    executor = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix='source')
+    start = time.monotonic()
+    futures = {name: executor.submit(task) for name, task in tasks.items()}
+
+    results = {}
+    for name, future in futures.items():
+        budget = budgets.get(name, DEFAULT_BUDGET)
+        remaining = start + budget - time.monotonic()
+        try:
+            results[name] = future.result(timeout=max(remaining, 0))
+        except FutureTimeoutError:
+            cancelled = future.cancel()
+            status = "cancelled" if cancelled else "abandoned"
+            if logger:
+                logger.log_text(f"Source {name} exceeded its {budget:.0f}s budget and was {status}", severity="ERROR")
+            results[name] = f"{name}: {status} after exceeding {budget:.0f}s budget"
+        except Exception as e:
+            if logger:
+                logger.log_text(f"Source {name} failed: {str(e)}", severity="ERROR")
+            results[name] = f"{name}: failed - {str(e)}"
+
+    # Do not wait for abandoned workers, the summary must be returned within the function timeout
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results
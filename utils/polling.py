@@ -0,0 +1,103 @@
+import os
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from utils.orchestrator import get_budgets
+
+# Release times published by the sources are in Brasília time, the function runs in UTC
+TIMEZONE = ZoneInfo('America/Sao_Paulo')
+
+POLLING_MODE = os.environ.get('POLLING_MODE', '0') == '1'
+POLL_LEAD = timedelta(minutes=float(os.environ.get('POLL_LEAD_MINUTES', 5)))
+POLL_GIVE_UP = timedelta(minutes=float(os.environ.get('POLL_GIVE_UP_MINUTES', 30)))
+POLL_INTERVAL = float(os.environ.get('POLL_INTERVAL_SECONDS', 5))
+POLL_MAX_SECONDS = float(os.environ.get('POLL_MAX_SECONDS', 30))
+# Seconds of a source's budget kept for rendering and posting once polling stops
+POLL_RESERVE = float(os.environ.get('POLL_RESERVE_SECONDS', 15))
+
+
+def now_local() -> datetime:
+    """Current Brasília time as a naive datetime, comparable with the calendar release times."""
+    return datetime.now(TIMEZONE).replace(tzinfo=None)
+
+
+def today_local():
+    """Current Brasília date: the day of the release calendars, the tweeted logs and the SLA records."""
+    return now_local().date()
+
+
+def source_deadline(source: str) -> float:
+    """
+    time.monotonic() value after which a source stops polling: its budget (see
+    utils.orchestrator.get_budgets) minus POLL_RESERVE, counted from now. Shared by all the
+    indicators of the source, so polling them one after another stays within the budget.
+    """
+    return time.monotonic() + get_budgets([source])[source] - POLL_RESERVE
+
+
+def release_datetime(day, hora: str | None) -> datetime | None:
+    """
+    Combines a release day with an 'HH:MM' release time.
+
+    :param day: Release day (date, datetime, Timestamp or ISO string).
+    :param hora: Release time as 'HH:MM', or None when the calendar does not give one.
+    :return: Naive Brasília datetime of the release, or None without a release time.
+    """
+    if not isinstance(hora, str) or not hora:
+        return None
+    if isinstance(day, str):
+        day = datetime.fromisoformat(day)
+    if isinstance(day, datetime):
+        day = day.date()
+    hour, minute = (int(part) for part in hora.split(':'))
+    return datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute)
+
+
+def poll(check, release_at: datetime | None, logger=None, name: str = '', now=now_local, sleep=time.sleep, deadline: float = None):
+    """
+    Runs check() around the published release time until it returns something other than None.
+
+    With POLLING_MODE off, or without a release time, check() runs once, as before. Otherwise:
+    - before release_at - POLL_LEAD, nothing is fetched and None is returned;
+    - between release_at - POLL_LEAD and release_at + POLL_GIVE_UP, check() runs every
+      POLL_INTERVAL seconds until it returns data, the give-up time passes, POLL_MAX_SECONDS
+      are spent on this indicator or the source deadline passes;
+    - after the give-up time, check() runs once per invocation, so late releases are still caught.
+
+    :param check: Zero-argument callable returning the data, or None when it is not out yet.
+    :param release_at: Naive Brasília datetime of the release (see release_datetime).
+    :param logger: Optional logger with a log_text(text, severity) method.
+    :param name: Indicator name used in the log lines.
+    :param deadline: Optional time.monotonic() value shared by the indicators of a source (see source_deadline).
+    :return: The first result of check() that is not None, or None.
+    """
+    if not POLLING_MODE or release_at is None:
+        return check()
+
+    current = now()
+    if current < release_at - POLL_LEAD:
+        if logger:
+            logger.log_text(f"Too early to check {name}, release at {release_at:%H:%M}", severity="INFO")
+        return None
+    give_up_at = release_at + POLL_GIVE_UP
+    if current > give_up_at:
+        return check()
+
+    deadline = min(time.monotonic() + POLL_MAX_SECONDS, float('inf') if deadline is None else deadline)
+    if time.monotonic() >= deadline:
+        if logger:
+            logger.log_text(f"No polling time left for {name}, checking it on the next run", severity="WARNING")
+        return None
+    attempts = 0
+    while True:
+        attempts += 1
+        result = check()
+        if result is not None:
+            if logger:
+                logger.log_text(f"{name} found after {attempts} checks", severity="INFO")
+            return result
+        if now() > give_up_at or time.monotonic() + POLL_INTERVAL > deadline:
+            if logger:
+                logger.log_text(f"{name} not out yet after {attempts} checks", severity="INFO")
+            return None
+        sleep(POLL_INTERVAL)
@@ -0,0 +1,90 @@
+import argparse
+import json
+from datetime import datetime
+import pandas as pd
+from utils.polling import now_local
+from utils.storage_conn import get_storage
+
+SLA_PREFIX = 'tweeted-logs/sla'
+STAGES = ['scheduled', 'fetched', 'rendered', 'media_uploaded', 'tweeted']
+
+
+class SlaRecord:
+    """
+    Timestamps (Brasília time) of one indicator going from its official release to the tweet.
+
+    Call mark(stage) as each stage finishes and save() once the tweet is out. Records are stored
+    one object per post as tweeted-logs/sla/<YYYY-MM>/<YYYY-MM-DD>/<source>__<indicator>.json, so
+    concurrent sources never write to the same object.
+    """
+
+    def __init__(self, source: str, indicator: str, scheduled_at: datetime = None):
+        self.source = source
+        self.indicator = indicator
+        self.timestamps = {'scheduled': scheduled_at.isoformat() if scheduled_at else None}
+
+    def mark(self, stage: str):
+        self.timestamps[stage] = now_local().isoformat()
+
+    def to_dict(self) -> dict:
+        return {'source': self.source, 'indicator': self.indicator, **self.timestamps}
+
+    def save(self, storage=None):
+        day = now_local().date()
+        indicator = self.indicator.replace('/', '-')
+        path = f"{SLA_PREFIX}/{day.strftime('%Y-%m')}/{day}/{self.source}__{indicator}.json"
+        try:
+            (storage or get_storage()).write_bytes(path, json.dumps(self.to_dict()).encode('utf-8'), content_type='application/json')
+        except Exception as e:
+            print(f"An error occurred while saving the SLA record {path}: {e}")
+
+
+def load_records(month: str, storage=None) -> pd.DataFrame:
+    """
+    Loads every SLA record of a month.
+
+    :param month: Month as 'YYYY-MM'.
+    :return: DataFrame with one row per post and one datetime column per stage.
+    """
+    storage = storage or get_storage()
+    records = [json.loads(raw) for raw in storage.read_prefix(f"{SLA_PREFIX}/{month}/").values()]
+    df = pd.DataFrame(records, columns=['source', 'indicator'] + STAGES)
+    for stage in STAGES:
+        df[stage] = pd.to_datetime(df[stage])
+    return df
+
+
+def sla_report(df: pd.DataFrame, percentiles=(0.5, 0.9, 0.99)) -> pd.DataFrame:
+    """
+    Aggregates release-to-stage latencies, in seconds, per source and per stage.
+
+    For each stage after 'scheduled', 'from_release' is the time since the official release and
+    'stage' the time since the previous stage, which shows where a slow post spent its time.
+
+    :param df: Records as returned by load_records.
+    :return: DataFrame indexed by (source, stage, measure) with count and percentile columns.
+    """
+    rows = []
+    for previous, stage in zip(STAGES, STAGES[1:]):
+        from_release = (df[stage] - df['scheduled']).dt.total_seconds()
+        from_previous = (df[stage] - df[previous]).dt.total_seconds()
+        for measure, values in (('from_release', from_release), ('stage', from_previous)):
+            rows.append(pd.DataFrame({'source': df['source'], 'stage': stage, 'measure': measure, 'seconds': values}))
+    latencies = pd.concat(rows).dropna(subset=['seconds'])
+    latencies['stage'] = pd.Categorical(latencies['stage'], categories=STAGES[1:], ordered=True)
+    grouped = latencies.groupby(['source', 'stage', 'measure'], observed=True)['seconds']
+    report = grouped.quantile(list(percentiles)).unstack()
+    report.columns = [f"p{int(p * 100)}" for p in report.columns]
+    report.insert(0, 'count', grouped.count())
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Release-to-post latency report per source and stage.")
+    parser.add_argument("month", nargs="?", default=now_local().strftime('%Y-%m'), help="Month as YYYY-MM")
+    args = parser.parse_args()
+    records = load_records(args.month)
+    if records.empty:
+        print(f"No SLA records for {args.month}")
+    else:
+        print(sla_report(records).round(1).to_string())
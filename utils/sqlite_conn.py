@@ -0,0 +1,167 @@
+import argparse
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+# Local stand-in for BigQuery, selected with WAREHOUSE=sqlite (see utils.bq_conn)
+WAREHOUSE_PATH = os.environ.get('WAREHOUSE_PATH', os.path.join(os.environ.get('STORAGE_DIR', '.'), 'warehouse.sqlite'))
+
+_TYPES = {bool: 'INTEGER', int: 'INTEGER', float: 'REAL'}
+
+
+@contextmanager
+def _connect(path: str = None):
+    # One connection per call, so parallel workers never share one; commits on success
+    conn = sqlite3.connect(path or WAREHOUSE_PATH, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _table_name(project_id: str, dataset_id: str, table_id: str) -> str:
+    # Quoted as one identifier, so BigQuery-style `project.dataset.table` queries work unchanged
+    return f"{project_id}.{dataset_id}.{table_id}"
+
+
+def _to_sql_value(value):
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _ensure_table(conn, table: str, rows: list[dict], key: str):
+    """Creates the table, or adds the columns it is missing, from the columns present in the rows (REAL when all None)."""
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    types = {}
+    for column in columns:
+        sample = next((_to_sql_value(row[column]) for row in rows if _to_sql_value(row.get(column)) is not None), None)
+        # A column with no value yet (e.g. the PPI of a holiday) is numeric, as its BigQuery counterpart
+        types[column] = 'REAL' if sample is None else _TYPES.get(type(sample), 'TEXT')
+
+    existing = [info[1] for info in conn.execute(f'PRAGMA table_info("{table}")')]
+    if not existing:
+        definitions = ", ".join(f'"{column}" {types[column]}' for column in columns)
+        conn.execute(f'CREATE TABLE "{table}" ({definitions})')
+    else:
+        for column in columns:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {types[column]}')
+    conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{table}__{key}" ON "{table}" ("{key}")')
+    return columns
+
+
+def get_data_from_sqlite_table(project_id: str, dataset_id: str, table_id: str, query: str = None, sort_by_date: bool = True,
+                               start_date=None, end_date=None, cached: bool = False, storage=None, path: str = None):
+    """
+    Same interface and result as utils.bq_conn.get_data_from_bq_table, read from the local SQLite
+    warehouse. cached and storage are accepted for compatibility and ignored.
+    """
+    table = _table_name(project_id, dataset_id, table_id)
+    params = []
+    if query is None:
+        conditions = []
+        if start_date is not None:
+            conditions.append("date >= ?")
+            params.append(pd.Timestamp(start_date).date().isoformat())
+        if end_date is not None:
+            conditions.append("date <= ?")
+            params.append(pd.Timestamp(end_date).date().isoformat())
+        base_query = f'SELECT * FROM "{table}"' + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+        query = base_query + " ORDER BY date ASC" if sort_by_date else base_query
+
+    try:
+        with _connect(path) as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        df['date'] = pd.to_datetime(df['date'])
+        df.set_index('date', drop=True, inplace=True)
+        return df.dropna(how='any')
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return pd.DataFrame()
+
+
+def upsert_sqlite_table(project_id: str, dataset_id: str, table_id: str, data: list[dict], key: str = 'date', path: str = None):
+    """
+    Same interface and MERGE semantics as utils.bq_conn.upsert_bq_table: rows matching the key
+    are updated, the others inserted, in a single INSERT ... ON CONFLICT DO UPDATE transaction.
+    """
+    if not data:
+        return
+
+    table = _table_name(project_id, dataset_id, table_id)
+    rows = list({_to_sql_value(row[key]): row for row in data}.values())
+
+    try:
+        with _connect(path) as conn:
+            columns = _ensure_table(conn, table, rows, key)
+            names = ", ".join(f'"{column}"' for column in columns)
+            updates = ", ".join(f'"{column}" = excluded."{column}"' for column in columns if column != key)
+            query = (
+                f'INSERT INTO "{table}" ({names}) '
+                f'VALUES ({", ".join("?" for _ in columns)}) '
+                f'ON CONFLICT ("{key}") ' + (f'DO UPDATE SET {updates}' if updates else 'DO NOTHING')
+            )
+            conn.executemany(query, [[_to_sql_value(row.get(column)) for column in columns] for row in rows])
+        print(f"Successfully processed data for {len(rows)} dates")
+    except Exception as e:
+        print(f"An error occurred while upserting {len(rows)} rows into {table}: {str(e)}")
+
+
+def _synthetic_rows(years: int, end: date) -> list[dict]:
+    days = pd.bdate_range(end=end, periods=years * 252)
+    rng = np.random.default_rng(0)
+    values = rng.normal(0, 5, size=(len(days), 4)).cumsum(axis=0).round(2)
+    return [
+        {'date': day.date(), 'diesel_pct': row[0], 'diesel_brl': row[1] / 10, 'gasolina_pct': row[2], 'gasolina_brl': row[3] / 10}
+        for day, row in zip(days, values)
+    ]
+
+
+def load_test(years: int = 10, window: int = 5, path: str = None):
+    """
+    Times the upsert and read paths against years of synthetic ABICOM-like rows.
+
+    Compares upserting the last `window` rows one statement (and transaction) per row, as
+    upsert_bq_table used to do with one MERGE job per row, against a single bulk upsert, and a
+    full-history read against a windowed one.
+    """
+    path = path or WAREHOUSE_PATH
+    args = ('bench', 'warehouse', f'ppi_{years}y')
+    rows = _synthetic_rows(years, date.today())
+
+    def timed(label, func):
+        start = time.perf_counter()
+        result = func()
+        print(f"{label:<40}{(time.perf_counter() - start) * 1000:>10.1f} ms")
+        return result
+
+    with _connect(path) as conn:
+        conn.execute(f'DROP TABLE IF EXISTS "{_table_name(*args)}"')
+    timed(f"load {len(rows)} rows (bulk)", lambda: upsert_sqlite_table(*args, rows, path=path))
+    recent = rows[-window:]
+    timed(f"upsert {window} rows, one per transaction", lambda: [upsert_sqlite_table(*args, [row], path=path) for row in recent])
+    timed(f"upsert {window} rows, bulk", lambda: upsert_sqlite_table(*args, recent, path=path))
+    df = timed("read full history", lambda: get_data_from_sqlite_table(*args, path=path))
+    timed("read last 400 days", lambda: get_data_from_sqlite_table(*args, start_date=df.index[-1] - pd.Timedelta(days=400), path=path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of the local SQLite warehouse.")
+    parser.add_argument("--years", type=int, default=10, help="Years of synthetic business days to load")
+    parser.add_argument("--window", type=int, default=5, help="Rows upserted per run")
+    parser.add_argument("--path", default=None, help="SQLite file, defaults to WAREHOUSE_PATH")
+    args = parser.parse_args()
+    load_test(args.years, args.window, args.path)
@@ -0,0 +1,117 @@
+import os
+import threading
+from pathlib import Path
+
+BUCKET_NAME = 'tt-bot'
+READ_ATTEMPTS = 3
+
+# One client and bucket handle per process, reused by warm instances
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+class GenerationMismatch(Exception):
+    """Raised when a conditional write finds the object changed (or already created)."""
+
+
+class GCSStorage:
+    """Reads and writes objects in the bot's Cloud Storage bucket."""
+
+    def __init__(self, bucket_name: str = BUCKET_NAME):
+        from google.cloud import storage
+        # client.bucket() only builds the handle, unlike get_bucket() it costs no metadata request
+        self.bucket = storage.Client().bucket(bucket_name)
+
+    def read_bytes(self, path: str) -> bytes | None:
+        from google.api_core.exceptions import NotFound
+        try:
+            return self.bucket.blob(path).download_as_bytes()
+        except NotFound:
+            return None
+
+    def read_versioned(self, path: str) -> tuple[bytes | None, int]:
+        """Returns the content of an object and its generation, (None, 0) when it does not exist."""
+        from google.api_core.exceptions import NotFound, PreconditionFailed
+        blob = self.bucket.blob(path)
+        for _ in range(READ_ATTEMPTS):
+            try:
+                blob.reload()
+                return blob.download_as_bytes(if_generation_match=blob.generation), blob.generation
+            except NotFound:
+                return None, 0
+            except PreconditionFailed:
+                # Replaced between the metadata and the content reads
+                continue
+        raise GenerationMismatch(path)
+
+    def write_bytes(self, path: str, data: bytes, content_type: str = 'application/octet-stream', if_generation_match: int = None):
+        """Writes an object. With if_generation_match, 0 means create-only."""
+        from google.api_core.exceptions import PreconditionFailed
+        try:
+            self.bucket.blob(path).upload_from_string(data, content_type=content_type, if_generation_match=if_generation_match)
+        except PreconditionFailed as e:
+            raise GenerationMismatch(path) from e
+
+    def list(self, prefix: str) -> list[str]:
+        return [blob.name for blob in self.bucket.list_blobs(prefix=prefix)]
+
+    def read_prefix(self, prefix: str) -> dict:
+        return {blob.name: blob.download_as_bytes() for blob in self.bucket.list_blobs(prefix=prefix)}
+
+    def delete(self, path: str):
+        from google.api_core.exceptions import NotFound
+        try:
+            self.bucket.blob(path).delete()
+        except NotFound:
+            pass
+
+
+class LocalStorage:
+    """Same interface as GCSStorage, backed by a local directory (for tests and offline runs)."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _generation(self, file: Path) -> int:
+        return file.stat().st_mtime_ns if file.is_file() else 0
+
+    def read_bytes(self, path: str) -> bytes | None:
+        file = self.root / path
+        return file.read_bytes() if file.is_file() else None
+
+    def read_versioned(self, path: str) -> tuple[bytes | None, int]:
+        file = self.root / path
+        with self._lock:
+            return self.read_bytes(path), self._generation(file)
+
+    def write_bytes(self, path: str, data: bytes, content_type: str = 'application/octet-stream', if_generation_match: int = None):
+        file = self.root / path
+        file.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if if_generation_match is not None and self._generation(file) != if_generation_match:
+                raise GenerationMismatch(path)
+            file.write_bytes(data)
+
+    def list(self, prefix: str) -> list[str]:
+        files = sorted(file.relative_to(self.root).as_posix() for file in self.root.rglob('*') if file.is_file())
+        return [path for path in files if path.startswith(prefix)]
+
+    def read_prefix(self, prefix: str) -> dict:
+        return {path: (self.root / path).read_bytes() for path in self.list(prefix)}
+
+    def delete(self, path: str):
+        (self.root / path).unlink(missing_ok=True)
+
+
+def get_storage():
+    """
+    Returns the storage backend: a LocalStorage rooted at STORAGE_DIR when the variable
+    is set, otherwise the 'tt-bot' Cloud Storage bucket. Backends are built once per process.
+    """
+    root = os.environ.get('STORAGE_DIR')
+    key = ('local', root) if root else ('gcs', BUCKET_NAME)
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = LocalStorage(root) if root else GCSStorage()
+        return _instances[key]
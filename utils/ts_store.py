@@ -0,0 +1,115 @@
+import io
+import os
+import re
+import threading
+from pathlib import Path
+import pandas as pd
+from utils.storage_conn import get_storage
+
+STORE_PREFIX = 'timeseries'
+# Instance-local copy of the stored series (/tmp is the writable disk of a Cloud Function)
+CACHE_DIR = Path(os.environ.get('TS_CACHE_DIR', '/tmp/ts-store'))
+
+# Warm instances keep the series they already read
+_memory = {}
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _key(series: str) -> str:
+    return f"{STORE_PREFIX}/{re.sub(r'[^0-9A-Za-z._/-]', '_', series)}.parquet"
+
+
+def _lock(series: str) -> threading.Lock:
+    with _locks_lock:
+        return _locks.setdefault(series, threading.Lock())
+
+
+def _from_parquet(raw: bytes) -> pd.DataFrame:
+    return pd.read_parquet(io.BytesIO(raw))
+
+
+def _to_parquet(df: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    df.to_parquet(buffer)
+    return buffer.getvalue()
+
+
+def read_series(series: str, storage=None) -> pd.DataFrame | None:
+    """
+    Returns the stored observations of a series, or None when it was never stored.
+
+    Looks in memory, then in the local cache (CACHE_DIR), then in the bucket (or STORAGE_DIR).
+
+    :param series: Series identifier, e.g. 'sgs/24364' or 'sidra/1737/63'.
+    :return: DataFrame indexed by date.
+    """
+    key = _key(series)
+    if key in _memory:
+        return _memory[key]
+    try:
+        file = CACHE_DIR / key
+        raw = file.read_bytes() if file.is_file() else (storage or get_storage()).read_bytes(key)
+        df = _from_parquet(raw) if raw else None
+    except Exception as e:
+        print(f"An error occurred while reading the stored series {series}: {e}")
+        return None
+    if df is not None:
+        _memory[key] = df
+    return df
+
+
+def last_observation(series: str, storage=None) -> pd.Timestamp | None:
+    """Date of the newest stored observation of a series, None when nothing is stored."""
+    df = read_series(series, storage)
+    return None if df is None or df.empty else df.index.max()
+
+
+def delta_start(series: str, start, overlap: pd.DateOffset, storage=None) -> pd.Timestamp:
+    """
+    First date a fetcher has to request from the source.
+
+    :param start: First date the caller needs.
+    :param overlap: Period before the last stored observation requested again, so revised
+                    recent values replace the stored ones.
+    :return: start when the store does not cover it, otherwise the last observation minus overlap.
+    """
+    start = pd.Timestamp(start)
+    df = read_series(series, storage)
+    if df is None or df.empty or df.index.min() > start:
+        return start
+    return max(start, df.index.max() - overlap)
+
+
+def append_delta(series: str, df: pd.DataFrame, storage=None) -> pd.DataFrame:
+    """
+    Upserts new observations into a stored series.
+
+    Rows of df replace the stored rows with the same date, the others are appended. The merged
+    series is written back to the bucket and to the local cache, unless it equals the stored one.
+
+    :param series: Series identifier.
+    :param df: New observations, indexed by date.
+    :return: The full merged series.
+    """
+    key = _key(series)
+    with _lock(series):
+        stored = read_series(series, storage)
+        if stored is not None and df.empty:
+            return stored
+        if stored is not None and not stored.empty:
+            df = pd.concat([stored[~stored.index.isin(df.index)], df])
+        df = df.sort_index()
+        if stored is not None and df.equals(stored):
+            # Nothing new or revised, the stored copy stays as it is
+            return stored
+        _memory[key] = df
+        try:
+            raw = _to_parquet(df)
+            file = CACHE_DIR / key
+            file.parent.mkdir(parents=True, exist_ok=True)
+            file.write_bytes(raw)
+            (storage or get_storage()).write_bytes(key, raw, content_type='application/vnd.apache.parquet')
+        except Exception as e:
+            print(f"An error occurred while storing the series {series}: {e}")
+    return df